@@ -0,0 +1,138 @@
+"""
+This is Project IGI Graph Viewer benchmark suite which times the parser and the plotting hot paths on synthetic graph files.
+The graph files are generated with a fixed seed so the numbers can be compared between runs and machines.
+usage : python -m benchmarks.graph_benchmark --sizes 100 1000 10000 100000 --repeat 5 --json results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+# Configure logging before the apps are imported so they don't log to their files
+logging.basicConfig(level=logging.WARNING)
+
+from libs.graph_data_parser import select_file, convert_to_json
+from libs.graph_data_writer import write_synthetic_graph
+from libs.graph_jobs import BackgroundJob, load_graph_file
+import plotly.io as pio
+from libs.graph_figure import build_figure, get_edges, material_codes_and_sizes, prepare_hover_data
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+# Benchmark cases, each one turns a parsed graph and its file path into the callable that is timed
+def case_select_file(graph, filename):
+    return lambda: select_file(filename)
+
+# The desktop viewer's loader, which streams the memory mapped file in chunks with progress
+def case_load_graph_file(graph, filename):
+    return lambda: load_graph_file(BackgroundJob(load_graph_file), filename)
+
+def case_convert_to_json(graph, filename):
+    return lambda: convert_to_json(graph)
+
+def case_get_edges(graph, filename):
+    return lambda: get_edges(graph)
+
+def case_prepare_hover_data(graph, filename):
+    return lambda: prepare_hover_data(graph, True, True, True, True, True)
+
+def build_plot_3d_figure(graph):
+    edge_x, edge_y, edge_z = get_edges(graph)
+    hover_data = prepare_hover_data(graph, True, True, True, True, True)
+    codes, sizes = material_codes_and_sizes(graph, 30)
+    nodes = graph.nodes
+    return lambda: build_figure('scatter', 'square', nodes['x'], nodes['y'], nodes['z'], edge_x, edge_y, edge_z, hover_data, codes, sizes, True, 'cube')
+
+def case_plot_3d_figure(graph, filename):
+    return build_plot_3d_figure(graph)
+
+# The JSON the browser gets from st.plotly_chart and fig.show()
+def case_figure_json(graph, filename):
+    fig = build_plot_3d_figure(graph)()
+    return lambda: pio.to_json(fig, validate=False)
+
+CASES = [
+    ("select_file", case_select_file),
+    ("load_graph_file", case_load_graph_file),
+    ("convert_to_json", case_convert_to_json),
+    ("get_edges", case_get_edges),
+    ("prepare_hover_data", case_prepare_hover_data),
+    ("plot_3d figure", case_plot_3d_figure),
+    ("figure json", case_figure_json),
+]
+
+def measure_peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+# Bytes of the arrays a parsed graph holds, the floor for the peak memory of parsing it
+def decoded_size(graph):
+    adjacency = graph.adjacency
+    return sum(array.nbytes for array in (graph.nodes, graph.edges, adjacency.offsets, adjacency.neighbours, adjacency.edge_rows))
+
+def run_case(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+def run_benchmarks(sizes, repeat, cases, memory, seed, work_dir):
+    results = []
+    for size in sizes:
+        filename = os.path.join(work_dir, f"graph{size}.dat")
+        file_size = write_synthetic_graph(filename, size, seed)
+        graph = select_file(filename)
+        for name, make_case in cases:
+            function = make_case(graph, filename)
+            timings = run_case(function, repeat)
+            median = statistics.median(timings)
+            result = {
+                "case": name,
+                "nodes": len(graph),
+                "edges": len(graph.edges),
+                "file MB": round(file_size / 1e6, 3),
+                "min ms": round(min(timings) * 1000, 3),
+                "median ms": round(median * 1000, 3),
+                "nodes/s": round(len(graph) / median) if median else 0,
+                "MB/s": round(file_size / median / 1e6, 2) if median else 0,
+            }
+            if memory:
+                result["peak MB"] = round(measure_peak_memory(function) / 1e6, 3)
+                result["decoded MB"] = round(decoded_size(graph) / 1e6, 3)
+            results.append(result)
+            print_result(result)
+    return results
+
+def print_result(result):
+    print("  ".join(f"{key}={value}" for key, value in result.items()), flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the graph parser and plotting hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Node counts of the generated graphs")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case, the median is reported")
+    parser.add_argument("--cases", nargs="+", choices=[name for name, _ in CASES], help="Only run these cases")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated graphs")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the extra run that measures peak memory")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.cases or case[0] in args.cases]
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args.sizes, args.repeat, cases, not args.no_memory, args.seed, work_dir)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,20 @@ date : 12/08/2023
 author : @heaven_hm
 """
 
-import json
 import logging
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import pandas as pd
-import plotly.graph_objects as go
 import tkinter as tk
 from tkinter import ttk
-from libs.graph_data_parser import select_file,material_mapping
-from graph_const import material_colors,material_mapping
-import pandas as pd
+from libs.graph_cache import GraphCache
+from libs.graph_diff import DEFAULT_POSITION_TOLERANCE, diff_graphs
+from libs.graph_figure import DEFAULT_POINT_BUDGET, TraceCache, build_graph_figure
+from libs.graph_paths import get_router
+from libs.graph_export import export_graph
+from libs.graph_jobs import BackgroundJob, load_graph_file
+from libs.graph_table import TABLE_COLUMNS, GraphTable
+from libs.graph_profiler import profiler
+from graph_const import material_mapping
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter.ttk import Treeview
@@ -23,171 +26,277 @@ from tkinter.ttk import Treeview
 # Constants
 NODE_RADIUS_SIZE = 30
 NODE_SYMBOL = 'square'
+PLOT_TYPES = {"3D Scatter": 'scatter', "3D Surface": 'surface', "3D Line": 'line', "3D Mesh": 'mesh'}
+JOB_POLL_INTERVAL_MS = 50
+TABLE_PAGE_ROWS = 15
 tree_view = None
+graph_table = None
+table_offset = 0
+table_sort = (None, False)
+current_job = None
+graph_comparison = None  # Edited graph and its diff from the selected graph, set by Compare
 
 logging.basicConfig(filename='graph_generator.log', level=logging.DEBUG)
-graph_json_data = None
- 
-def load_json_data(data_str):
-    try:
-        return json.loads(data_str)
-    except json.JSONDecodeError:
-        logging.error("Invalid JSON data")
-        messagebox.showerror("Error", "Invalid JSON data")
-        return None
+graph_data = None
+graph_cache = GraphCache()
+trace_cache = TraceCache()
+
+# Everything the plot needs from the settings, read on the UI thread since Tk widgets can't be read from the worker
+def read_plot_settings():
+    return {
+        'plot_type': PLOT_TYPES.get(graph_type_combobox.get()),
+        'symbol': node_symbol_combobox.get(),
+        'show_links': show_links.get(),
+        'show_material': show_material.get(),
+        'show_gamma_radius': show_gamma_radius.get(),
+        'show_criteria': show_criteria.get(),
+        'ignore_height': ignore_node_height.get(),
+        'node_radius_size': int(node_radius_entry.get()),
+        'point_budget': int(point_budget_entry.get()) if level_of_detail_enabled.get() else None,
+        'path_start': path_start_entry.get().strip(),
+        'path_goal': path_goal_entry.get().strip(),
+        'path_edge_types': [int(edge_type) for edge_type in path_edge_types_entry.get().replace(',', ' ').split()] or None,
+        'path_materials': [material.strip() for material in path_materials_entry.get().split(',') if material.strip()] or None,
+    }
+
+# Figure of the graph and the messages for the status bar, runs on the worker. Links are always drawn, the links
+# setting only adds them to the hover text.
+def plot_3d(job, graph, settings, path=None, diff=None, original=None):
+    plot_type = settings['plot_type']
+    logging.info(f"Generating 3D {plot_type} plot")
+    status = []
+    fig, level_of_detail = build_graph_figure(graph, trace_cache, plot_type, settings['symbol'], settings['show_links'], settings['show_material'], settings['show_gamma_radius'], settings['show_criteria'],
+                                              node_radius_size=settings['node_radius_size'], point_budget=settings['point_budget'], path=path, diff=diff, original=original, progress=job.progress)
+    if level_of_detail and level_of_detail.decimated:
+        status.append(f"Showing {len(level_of_detail)} clusters of {level_of_detail.node_count} nodes")
+    if fig is None:
+        return status
+    job.progress(0.9, "Opening plot")
+    with profiler.stage("serialization", records=len(level_of_detail.graph if level_of_detail else graph)):
+        fig.show()
+    logging.info(f"3D {plot_type} plot generated successfully")
+    return status
+
+# Only one job runs at a time, starting a new one cancels the one before it
+def start_job(description, work, on_done, *args):
+    global current_job
+    if current_job is not None:
+        current_job.cancel()
+    current_job = BackgroundJob(work, *args).start()
+    status_bar['text'] = description
+    cancel_button.state(['!disabled'])
+    app.after(JOB_POLL_INTERVAL_MS, poll_job, current_job, description, on_done)
+
+def poll_job(job, description, on_done):
+    global current_job
+    for kind, value in job.poll():
+        if job is not current_job:
+            return  # Replaced by a newer job, its result is dropped
+        if kind == "progress":
+            fraction, text = value
+            status_bar['text'] = f"{description}: {text} {fraction:.0%}"
+            continue
+        current_job = None
+        cancel_button.state(['disabled'])
+        if kind == "done":
+            status_bar['text'] = "Ready"
+            on_done(value)
+        elif kind == "cancelled":
+            status_bar['text'] = f"{description}: cancelled"
+        else:
+            status_bar['text'] = f"{description}: failed"
+            messagebox.showerror("Error", f"{description} failed: {value}")
+        return
+    app.after(JOB_POLL_INTERVAL_MS, poll_job, job, description, on_done)
 
-def get_edges(data):
-    edge_x = []
-    edge_y = []
-    edge_z = []
-    for item in data:
-        if "edges" in item:
-            for edge in item["edges"]:
-                target_node = next((node for node in data if node["id"] == edge), None)
-                if target_node:
-                    edge_x.extend([item["x"], target_node["x"], None])
-                    edge_y.extend([item["y"], target_node["y"], None])
-                    edge_z.extend([item["z"], target_node["z"], None])
-    return edge_x, edge_y, edge_z
- 
-def prepare_node_colors_and_sizes(data):
-   
-    logging.debug(f"material_colors list: {material_colors}")
-    NODE_RADIUS_SIZE = int(node_radius_entry.get())
+def on_cancel_job():
+    if current_job is not None:
+        current_job.cancel()
+        status_bar['text'] = "Cancelling..."
+
+# Parsed graph and its table, runs on the worker
+def load_graph(job, file_path):
+    graph = load_graph_file(job, file_path, graph_cache)
+    return file_path, graph, GraphTable(graph)
+
+def on_select_file():
+    file_path = filedialog.askopenfilename(filetypes=[("Graph files", "*.dat"), ("All files", "*.*")])
+    if file_path:
+        logging.debug(f"Selected file: {file_path}")
+        start_job(f"Loading {file_path.split('/')[-1]}", load_graph, on_graph_loaded, file_path)
+
+def on_graph_loaded(result):
+    global graph_data, graph_table, table_sort, graph_comparison
+    file_path, graph_data, graph_table = result
+    table_sort = (None, False)
+    graph_comparison = None
     
-    colors = []
-    sizes = []
-    for item in data:
-        material = item['material']
-        color = material_colors.get(material_mapping.get(material, 'UNKNOWN'), 'purple')  # Default to 'gray' if material isn't found
-        logging.debug(f"Material: {material}, Color: {color}")
-        colors.append(color)
-        sizes.append(item['radius'] * NODE_RADIUS_SIZE) 
-        logging.debug(f"Radius: {item['radius']}")
+    # load the node columns as table in json_input, clicking a heading sorts by that column
+    tree_view["columns"] = TABLE_COLUMNS
+    tree_view["show"] = "headings"
+    for column in tree_view["columns"]:
+        tree_view.heading(column, text=column, command=lambda column=column: on_sort_table(column))
+    apply_table_view()
     
-    return colors, sizes
-
-
-def prepare_hover_text(data):
-    text_data = []
-    for item in data:
-        text = f"Node ID: {item['id']}"
-        if show_links.get():
-            text += f"<br>Links: {', '.join(map(str, item['edges']))}"
-        if show_material.get():
-            text += f"<br>Material: {item['material']}"
-        if show_gamma_radius.get():
-            text += f"<br>Gamma: {item['gamma']}<br>Radius: {item['radius']}"
-        if show_criteria.get():
-            text += f"<br>Criteria: {item['criteria']}"
-        text_data.append(text)
-    return text_data
-
-
-def plot_3d(data, plot_type='scatter',symbol=None):
-    logging.info(f"Generating 3D {plot_type} plot")
-    x_data = [item['x'] for item in data]
-    y_data = [item['y'] for item in data]
-    z_data = [item['z'] for item in data]
-    edge_x, edge_y, edge_z = get_edges(data)
-    hover_texts = prepare_hover_text(data)
-    colors, sizes = prepare_node_colors_and_sizes(data)
-    
-    fig = go.Figure()
-    if plot_type == 'scatter':
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='markers', marker=dict(color=colors, size=sizes, symbol=symbol, sizemode='diameter'), text=hover_texts, hoverinfo='text'))
-    elif plot_type == 'surface':
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='markers', marker=dict(color=colors, size=sizes, sizemode='diameter'), text=hover_texts, hoverinfo='text'))
-    elif plot_type == 'line':
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='lines+markers', marker=dict(color=colors, size=sizes, sizemode='diameter'), line=dict(color='red'), text=hover_texts, hoverinfo='text'))
-    elif plot_type == 'mesh':
-        # Use intensity to map colors to a colorscale
-        intensity = list(range(len(colors)))
-        fig.add_trace(go.Mesh3d(x=x_data, y=y_data, z=z_data, opacity=0.5, hoverinfo='text', hovertext=hover_texts, intensity=intensity, colorscale='Viridis', cmin=0, cmax=len(colors)-1))
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='markers', marker=dict(color=colors, size=sizes, sizemode='diameter'), text=hover_texts, hoverinfo='text'))
+    json_label['text'] = file_path.split('/')[-1]
+
+# The Treeview only holds the page of rows on screen, scrolling replaces them with the rows at the new offset
+def show_table_page(offset):
+    global table_offset
+    if graph_table is None:
+        return
+    table_offset = max(0, min(offset, len(graph_table) - TABLE_PAGE_ROWS))
+    tree_view.delete(*tree_view.get_children())
+    for row in graph_table.page(table_offset, TABLE_PAGE_ROWS):
+        tree_view.insert("", "end", values=row)
+    if len(graph_table):
+        scroll_y.set(table_offset / len(graph_table), min((table_offset + TABLE_PAGE_ROWS) / len(graph_table), 1.0))
     else:
-        logging.error(f"Invalid plot type: {plot_type}")
+        scroll_y.set(0.0, 1.0)
+
+def on_table_scroll(*args):
+    if graph_table is None:
+        return
+    if args[0] == "moveto":
+        show_table_page(int(float(args[1]) * len(graph_table)))
+    elif args[0] == "scroll":
+        show_table_page(table_offset + int(args[1]) * (TABLE_PAGE_ROWS if args[2] == "pages" else 1))
+
+def on_table_wheel(event):
+    show_table_page(table_offset + (-3 if event.num == 4 or event.delta > 0 else 3))
+    return "break"
+
+def on_sort_table(column):
+    global table_sort
+    # First click sorts ascending, clicking the same heading again sorts descending
+    table_sort = (column, table_sort == (column, False))
+    apply_table_view()
+
+def read_table_filters():
+    material = material_filter_combobox.get()
+    id_low = id_low_entry.get().strip()
+    id_high = id_high_entry.get().strip()
+    return {
+        'materials': [material] if material and material != 'All' else None,
+        'criteria': criteria_filter_entry.get().strip() or None,
+        'id_low': int(id_low) if id_low else None,
+        'id_high': int(id_high) if id_high else None,
+    }
+
+def apply_table_view():
+    if graph_table is None:
         return
+    try:
+        filters = read_table_filters()
+    except ValueError:
+        messagebox.showerror("Error", "Node ID range must be whole numbers")
+        return
+    sort_column, descending = table_sort
+    graph_table.update(sort_column, descending, **filters)
+    show_table_page(0)
+    status_bar['text'] = f"Showing {len(graph_table)} of {graph_table.node_count} nodes"
 
-    fig.add_trace(go.Scatter3d(x=edge_x, y=edge_y, z=edge_z, mode='lines', line=dict(color='red')))
-    fig.show()
-    logging.info(f"3D {plot_type} plot generated successfully")
 
-def on_select_file():
+def on_export_data():
+    if graph_data is None:
+        messagebox.showerror("Error", "Select a graph file to export")
+        return
+    file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json"), ("NDJSON files", "*.ndjson"), ("NumPy files", "*.npz"), ("Parquet files", "*.parquet"), ("Arrow files", "*.arrow"), ("All files", "*.*")])
+    if file_path:
+        try:
+            export_graph(file_path, graph_data)
+            messagebox.showinfo("Success", f"Graph exported to {file_path.split('/')[-1]} successfully!")
+        except Exception as e:
+            logging.error(f"Error exporting graph: {e}")
+            messagebox.showerror("Error", f"Error exporting graph: {e}")
+
+# Edited version of the selected graph and the changes to it, runs on the worker
+def load_graph_comparison(job, file_path, graph, tolerance):
+    edited_graph = load_graph_file(job, file_path, graph_cache)
+    job.progress(1.0, "Comparing")
+    return file_path, edited_graph, diff_graphs(graph, edited_graph, tolerance)
+
+def on_compare_file():
+    if graph_data is None:
+        messagebox.showerror("Error", "Select the original graph file to compare")
+        return
     try:
-        file_path = filedialog.askopenfilename(filetypes=[("Graph files", "*.dat"), ("All files", "*.*")])
-        if file_path:
-            # clear previous data in tree view
-            for item in tree_view.get_children():
-                tree_view.delete(item)
-            
-            global graph_json_data
-            logging.debug(f"Selected file: {file_path}")
-            json_data = select_file(file_path)
-            # convert JSON data to csv
-            json_data = json.loads(json_data)
-            json_data = pd.json_normalize(json_data)
-            
-            # load structured csv as table in json_input
-            tree_view["columns"] = list(json_data.columns)
-            tree_view["show"] = "headings"
-            for column in tree_view["columns"]:
-                tree_view.heading(column, text=column)
-            for index, row in json_data.iterrows():
-                tree_view.insert("", "end", values=list(row))
-            
-            graph_json_data = json_data.to_json(orient='records')
-            json_label['text'] = file_path.split('/')[-1]
-    except Exception as e:
-        logging.error(f"Error selecting file: {e}")
-        messagebox.showerror("Error", "Error selecting file")
-
-
-def on_export_to_json():
-    data_str = graph_json_data
-    # format json to 4 width indent
-    data_str = json.dumps(json.loads(data_str), indent=4)
-    file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        tolerance = float(diff_tolerance_entry.get())
+    except ValueError as e:
+        messagebox.showerror("Error", f"Invalid setting: {e}")
+        return
+    file_path = filedialog.askopenfilename(title="Select the edited graph", filetypes=[("Graph files", "*.dat"), ("All files", "*.*")])
     if file_path:
-        with open(file_path, 'w') as file:
-            file.write(data_str)
-        messagebox.showinfo("Success", "Graph exported to JSON successfully!")
-
-def adjust_data_based_on_input(data):
-    ignore_height = ignore_node_height.get()
-    if ignore_height:
-        for item in data:
-            item["z"] = 0  # Set Z position to 0 or any other default value
-    return data
+        start_job(f"Comparing with {file_path.split('/')[-1]}", load_graph_comparison, on_graph_compared, file_path, graph_data, tolerance)
+
+# Generate Graph shows the edited graph with the changes highlighted until another graph is selected
+def on_graph_compared(result):
+    global graph_comparison
+    file_path, edited_graph, diff = result
+    graph_comparison = (edited_graph, diff)
+    json_label['text'] = f"{json_label['text'].split(' vs ')[0]} vs {file_path.split('/')[-1]}"
+    status_bar['text'] = ", ".join(f"{count} {name}" for name, count in diff.summary().items() if count) or "No changes"
+
+# Path between the nodes set in Settings, None when no start and goal are set. Runs on the worker, the path
+# or the reason there is none is reported in the status bar.
+def find_graph_path(graph, settings, status):
+    start_id = settings['path_start']
+    goal_id = settings['path_goal']
+    if not start_id or not goal_id:
+        return None
+    path = get_router(graph).find_path(int(start_id), int(goal_id), settings['path_edge_types'], settings['path_materials'])
+    if path is None:
+        status.append(f"No path from node {start_id} to node {goal_id}")
+    else:
+        status.append(f"Path from node {start_id} to node {goal_id}: {path.hops} links, distance {path.distance:.2f}, {path.visited} nodes searched")
+    return path
+
+def adjust_data_based_on_input(graph, settings):
+    if settings['ignore_height']:
+        graph = graph.with_flat_height()
+    return graph
+
+# Path, adjusted graph and figure, runs on the worker. The path is found on the loaded graph, whose router is kept
+# with it and whose distances include the height, flattening keeps the node rows so the path is drawn on the flat graph.
+def generate_graph(job, graph, settings, comparison=None):
+    original, diff = None, None
+    if comparison is not None:
+        # Plot the edited graph, removed nodes are placed where they were in the original
+        original = adjust_data_based_on_input(graph, settings)
+        graph, diff = comparison
+    status = []
+    job.progress(0.0, "Path")
+    path = find_graph_path(graph, settings, status)
+    # Adjust data based on user's input
+    graph = adjust_data_based_on_input(graph, settings)
+    return status + plot_3d(job, graph, settings, path, diff, original)
 
 def on_generate_graph():
+    if graph_data is None:
+        return
     try:
-        data_str = graph_json_data
-        data = json.loads(data_str)
-        if not data:
-            return
-
-        # Adjust data based on user's input
-        data = adjust_data_based_on_input(data)
-
-        graph_type = graph_type_combobox.get()
-
-        if graph_type == "3D Scatter":
-            plot_3d(data, plot_type='scatter',symbol=node_symbol_combobox.get())
-        elif graph_type == "3D Surface":
-            plot_3d(data, plot_type='surface',symbol=node_symbol_combobox.get())
-        elif graph_type == "3D Line":
-            plot_3d(data, plot_type='line',symbol=node_symbol_combobox.get())
-        elif graph_type == "3D Mesh":
-            plot_3d(data, plot_type='mesh',symbol=node_symbol_combobox.get())
-    except Exception as e:
-        logging.error(f"Error generating graph: {e}")
-        messagebox.showerror("Error", "Error generating graph")
+        settings = read_plot_settings()
+    except ValueError as e:
+        messagebox.showerror("Error", f"Invalid setting: {e}")
+        return
+    start_job("Generating graph", generate_graph, on_graph_generated, graph_data, settings, graph_comparison)
+
+def on_graph_generated(status):
+    if status:
+        status_bar['text'] = ", ".join(status)
 
 # Functions
 def on_quit():
     app.quit()
 
+def on_show_timings():
+    timings_window = tk.Toplevel(app)
+    timings_window.title("Pipeline Timings")
+    timings_text = tk.Text(timings_window, height=14, width=90, font=("Courier New", 11))
+    timings_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+    timings_text.insert(tk.END, profiler.format_summary() if profiler.enabled else "Enable 'Pipeline Timings' in Settings to record timings")
+    timings_text.configure(state=tk.DISABLED)
+
 def on_help():
     help_message = "This is a GUI for Project IGI Graph Generator which generate the 3D graph of the game using the graph data file.\nSelect the graph file like graph4019.dat (Binary file) and click on Generate Graph button to generate the 3D graph.\nThis also has the option to export the graph data to JSON file.\n\nAuthor: @heaven_hm\nDate: 12 - Aug - 2023"
     messagebox.showinfo("Help", help_message)
@@ -218,15 +327,17 @@ graph_tree_view = tk.Text(main_frame, height=10, width=60, wrap=tk.WORD, font=("
 graph_tree_view.grid(row=1, column=0, columnspan=4, pady=5, padx=5, sticky=tk.W+tk.E+tk.N+tk.S)
 scroll_x = tk.Scrollbar(main_frame, orient=tk.HORIZONTAL, command=graph_tree_view.xview)
 scroll_x.grid(row=2, column=0, columnspan=4, sticky=tk.W+tk.E)
-scroll_y = tk.Scrollbar(main_frame, orient=tk.VERTICAL, command=graph_tree_view.yview)
+# Scrolls the rows of the table, which only holds the rows on screen
+scroll_y = tk.Scrollbar(main_frame, orient=tk.VERTICAL, command=on_table_scroll)
 scroll_y.grid(row=1, column=4, sticky=tk.N+tk.S)
 graph_tree_view['xscrollcommand'] = scroll_x.set
-graph_tree_view['yscrollcommand'] = scroll_y.set
 graph_tree_view.tag_configure("json", background="yellow")
 
 # Create the Treeview instance
-tree_view = Treeview(graph_tree_view)
+tree_view = Treeview(graph_tree_view, height=TABLE_PAGE_ROWS)
 tree_view.pack(side="left", fill="both")
+for wheel_event in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+    tree_view.bind(wheel_event, on_table_wheel)
 
 # Configure the rows and columns of the main frame to expand and fill the available space
 main_frame.grid_rowconfigure(1, weight=1)
@@ -241,6 +352,23 @@ graph_type_combobox = ttk.Combobox(main_frame, values=["3D Scatter", "3D Surface
 graph_type_combobox.grid(row=3, column=1, sticky=tk.W, pady=5, padx=5)
 graph_type_combobox.set("3D Scatter")
 
+# Table filters, applied together with the sorted column
+table_filter_frame = ttk.Frame(main_frame)
+table_filter_frame.grid(row=4, column=0, columnspan=4, sticky=tk.W, pady=5, padx=5)
+ttk.Label(table_filter_frame, text="Material:").pack(side=tk.LEFT)
+material_filter_combobox = ttk.Combobox(table_filter_frame, values=['All'] + sorted(set(material_mapping.values())), width=12)
+material_filter_combobox.pack(side=tk.LEFT, padx=5)
+material_filter_combobox.set('All')
+ttk.Label(table_filter_frame, text="Criteria:").pack(side=tk.LEFT)
+criteria_filter_entry = tk.Entry(table_filter_frame, width=10)
+criteria_filter_entry.pack(side=tk.LEFT, padx=5)
+ttk.Label(table_filter_frame, text="Node ID From/To:").pack(side=tk.LEFT)
+id_low_entry = tk.Entry(table_filter_frame, width=7)
+id_low_entry.pack(side=tk.LEFT, padx=5)
+id_high_entry = tk.Entry(table_filter_frame, width=7)
+id_high_entry.pack(side=tk.LEFT)
+ttk.Button(table_filter_frame, text="Filter", command=apply_table_view).pack(side=tk.LEFT, padx=5)
+
 # Settings Tab
 show_links = tk.BooleanVar()
 show_material = tk.BooleanVar()
@@ -256,6 +384,9 @@ ignore_node_height = tk.BooleanVar()
 ignore_height_checkbox = ttk.Checkbutton(settings_frame, text="Node Ignore Height", variable=ignore_node_height)
 ignore_height_checkbox.grid(row=2, column=0, sticky=tk.W, pady=5, padx=5)
 
+profile_timings = tk.BooleanVar(value=profiler.enabled)
+ttk.Checkbutton(settings_frame, text="Pipeline Timings", variable=profile_timings, command=lambda: profiler.enable(profile_timings.get())).grid(row=2, column=1, sticky=tk.W, pady=5, padx=5)
+
 ttk.Label(settings_frame, text="Node Radius Size:").grid(row=3, column=0, sticky=tk.W, pady=5, padx=5)
 node_radius_entry = tk.Entry(settings_frame)
 node_radius_entry.grid(row=3, column=1, sticky=tk.W, pady=5, padx=5)
@@ -266,6 +397,33 @@ node_symbol_combobox = ttk.Combobox(settings_frame, values=['circle', 'circle-op
 node_symbol_combobox.grid(row=4, column=1, sticky=tk.W, pady=5, padx=5)
 node_symbol_combobox.set("square")
 
+level_of_detail_enabled = tk.BooleanVar(value=True)
+ttk.Checkbutton(settings_frame, text="Level of Detail", variable=level_of_detail_enabled).grid(row=5, column=0, sticky=tk.W, pady=5, padx=5)
+point_budget_entry = tk.Entry(settings_frame)
+point_budget_entry.grid(row=5, column=1, sticky=tk.W, pady=5, padx=5)
+point_budget_entry.insert(0, str(DEFAULT_POINT_BUDGET))
+
+ttk.Label(settings_frame, text="Path Start/Goal ID:").grid(row=6, column=0, sticky=tk.W, pady=5, padx=5)
+path_ids_frame = ttk.Frame(settings_frame)
+path_ids_frame.grid(row=6, column=1, sticky=tk.W, pady=5, padx=5)
+path_start_entry = tk.Entry(path_ids_frame, width=9)
+path_start_entry.pack(side=tk.LEFT)
+path_goal_entry = tk.Entry(path_ids_frame, width=9)
+path_goal_entry.pack(side=tk.LEFT, padx=5)
+
+ttk.Label(settings_frame, text="Path Edge Types:").grid(row=7, column=0, sticky=tk.W, pady=5, padx=5)
+path_edge_types_entry = tk.Entry(settings_frame)
+path_edge_types_entry.grid(row=7, column=1, sticky=tk.W, pady=5, padx=5)
+
+ttk.Label(settings_frame, text="Path Materials:").grid(row=8, column=0, sticky=tk.W, pady=5, padx=5)
+path_materials_entry = tk.Entry(settings_frame)
+path_materials_entry.grid(row=8, column=1, sticky=tk.W, pady=5, padx=5)
+
+ttk.Label(settings_frame, text="Diff Position Tolerance:").grid(row=9, column=0, sticky=tk.W, pady=5, padx=5)
+diff_tolerance_entry = tk.Entry(settings_frame)
+diff_tolerance_entry.grid(row=9, column=1, sticky=tk.W, pady=5, padx=5)
+diff_tolerance_entry.insert(0, str(DEFAULT_POSITION_TOLERANCE))
+
 
 # Buttons
 button_frame = ttk.Frame(app)
@@ -273,9 +431,13 @@ button_frame.pack(pady=20)
 
 ttk.Button(button_frame, text="Generate Graph", command=on_generate_graph).grid(row=0, column=0, padx=10)
 ttk.Button(button_frame, text="Select Graph", command=on_select_file).grid(row=0, column=1, padx=10)
-ttk.Button(button_frame, text="Export JSON", command=on_export_to_json).grid(row=0, column=2, padx=10)
-ttk.Button(button_frame, text="Help", command=on_help).grid(row=0, column=3, padx=10)
-ttk.Button(button_frame, text="Quit", command=on_quit).grid(row=0, column=4, padx=10)
+ttk.Button(button_frame, text="Compare", command=on_compare_file).grid(row=0, column=2, padx=10)
+ttk.Button(button_frame, text="Export Data", command=on_export_data).grid(row=0, column=3, padx=10)
+ttk.Button(button_frame, text="Timings", command=on_show_timings).grid(row=0, column=4, padx=10)
+cancel_button = ttk.Button(button_frame, text="Cancel", command=on_cancel_job, state='disabled')
+cancel_button.grid(row=0, column=5, padx=10)
+ttk.Button(button_frame, text="Help", command=on_help).grid(row=0, column=6, padx=10)
+ttk.Button(button_frame, text="Quit", command=on_quit).grid(row=0, column=7, padx=10)
 
 # Status Bar
 status_bar = ttk.Label(app, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
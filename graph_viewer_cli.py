@@ -0,0 +1,270 @@
+"""
+This is Project IGI Graph Viewer command line tool which parses the graph data files without the GUI.
+It parses a whole directory of graph files in parallel and writes one dataset for the level.
+usage : python graph_viewer_cli.py parse <directory|glob|file>... -o level1.npz --level 1
+        python graph_viewer_cli.py export level1.npz -o level1.parquet
+        python graph_viewer_cli.py generate 1000 100000 -o synthetic
+        python graph_viewer_cli.py snap level1.npz points.csv -o nearest.csv
+        python graph_viewer_cli.py check path/to/level1 -o report.csv
+        python graph_viewer_cli.py diff old/graph4019.dat new/graph4019.dat -o changes.csv
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from libs.graph_analysis import analyze_graphs, is_broken
+from libs.graph_area_parser import AreaCatalog, DEFAULT_AREA_TTL, GAME_LEVELS
+from libs.graph_data_parser import parse_graphs, select_file
+from libs.graph_export import export_graph
+from libs.graph_data_writer import write_synthetic_graph
+from libs.graph_diff import DEFAULT_POSITION_TOLERANCE, diff_graphs
+from libs.graph_profiler import profiler
+from libs.graph_level_data import duplicate_graph_ids, find_graph_files, graph_id_from_filename, load_level_graph, load_level_graphs, save_level_dataset
+
+logging.basicConfig(level=logging.WARNING)
+
+def parse_level(args):
+    files = find_graph_files(args.inputs)
+    graph_files = [path for path in files if graph_id_from_filename(path) is not None]
+    for path in set(files) - set(graph_files):
+        logging.warning(f"Skipping {path}, no graph id in the filename")
+    if not graph_files:
+        print("No graph files found", file=sys.stderr)
+        return 1
+    duplicates = duplicate_graph_ids(graph_files)
+    for graph_id, paths in duplicates.items():
+        print(f"Graph id {graph_id} is used by more than one file: {', '.join(paths)}", file=sys.stderr)
+    if duplicates:
+        return 1
+
+    total_bytes = sum(os.path.getsize(path) for path in graph_files)
+    start_time = time.perf_counter()
+    graphs = parse_graphs(graph_files, max_workers=args.workers, use_processes=True)
+    parse_time = time.perf_counter() - start_time
+
+    graph_ids = []
+    parsed_graphs = []
+    for path, graph in zip(graph_files, graphs):
+        if graph is None:
+            print(f"Failed to parse {path}", file=sys.stderr)
+            continue
+        graph_ids.append(graph_id_from_filename(path))
+        parsed_graphs.append(graph)
+
+    nodes, edges = save_level_dataset(args.output, graph_ids, parsed_graphs, args.level)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Parsed {len(parsed_graphs)}/{len(graph_files)} graphs ({len(nodes)} nodes, {len(edges)} edges) in {parse_time:.3f}s")
+    print(f"Throughput: {len(graph_files) / parse_time:.1f} files/s, {total_bytes / parse_time / 1e6:.2f} MB/s")
+    print(f"Wrote {args.output} in {elapsed:.3f}s total")
+    print_timings(args)
+    return 0 if len(parsed_graphs) == len(graph_files) else 2
+
+def export_data(args):
+    graph = load_graph(args.input)
+    if graph is None:
+        print(f"Failed to read {args.input}", file=sys.stderr)
+        return 1
+    start_time = time.perf_counter()
+    export_graph(args.output, graph)
+    elapsed = time.perf_counter() - start_time
+    print(f"Exported {len(graph.nodes)} nodes to {args.output} in {elapsed:.3f}s ({os.path.getsize(args.output) / 1e6:.2f} MB)")
+    print_timings(args)
+    return 0
+
+def prefetch_areas(args):
+    catalog = AreaCatalog(base_url=args.base_url, ttl=0 if args.refresh else DEFAULT_AREA_TTL)
+    start_time = time.perf_counter()
+    failed_levels = catalog.prefetch(args.levels or GAME_LEVELS)
+    elapsed = time.perf_counter() - start_time
+    for level in failed_levels:
+        print(f"Failed to load area data for level {level}", file=sys.stderr)
+    print(f"Loaded area data for {len(args.levels or GAME_LEVELS) - len(failed_levels)} levels into {catalog.cache_dir} in {elapsed:.3f}s")
+    return 1 if failed_levels else 0
+
+def load_graph(filename):
+    # A level dataset written by parse or a single graph file
+    return load_level_graph(filename) if filename.lower().endswith(".npz") else select_file(filename)
+
+def snap_points(args):
+    graph = load_graph(args.input)
+    if graph is None:
+        print(f"Failed to read {args.input}", file=sys.stderr)
+        return 1
+    points = np.loadtxt(args.points, delimiter=",", ndmin=2, usecols=(0, 1, 2), skiprows=args.skip_rows)
+    start_time = time.perf_counter()
+    distances, rows = graph.spatial_index.query_nearest(points, args.k)
+    elapsed = time.perf_counter() - start_time
+
+    # One line per point and neighbour, nearest first
+    found = rows >= 0
+    point_rows = np.repeat(np.arange(len(points)), args.k).reshape(-1, args.k)[found]
+    nodes = graph.nodes[rows[found]]
+    result = pd.DataFrame({"point": point_rows, "x": points[point_rows, 0], "y": points[point_rows, 1], "z": points[point_rows, 2]})
+    if "graph" in nodes.dtype.names:
+        result["graph"] = nodes["graph"]
+    result["id"] = nodes["id"]
+    result["distance"] = distances[found].round(2)
+    result.to_csv(args.output or sys.stdout, index=False)
+    print(f"Snapped {len(points)} points to {len(graph.nodes)} nodes in {elapsed:.3f}s", file=sys.stderr)
+    return 0
+
+def check_graphs(args):
+    start_time = time.perf_counter()
+    if len(args.inputs) == 1 and args.inputs[0].lower().endswith(".npz"):
+        graph_ids, graphs = load_level_graphs(args.inputs[0])
+    else:
+        graph_files = find_graph_files(args.inputs)
+        if not graph_files:
+            print("No graph files found", file=sys.stderr)
+            return 1
+        graphs = parse_graphs(graph_files, max_workers=args.workers, use_processes=True)
+        graph_ids = [graph_id_from_filename(path) or os.path.basename(path) for path in graph_files]
+        for path, graph in zip(graph_files, graphs):
+            if graph is None:
+                print(f"Failed to parse {path}", file=sys.stderr)
+
+    report = analyze_graphs(graph_ids, graphs)
+    elapsed = time.perf_counter() - start_time
+    broken = report[report.apply(is_broken, axis=1)] if len(report) else report
+    shown = broken if args.only_broken else report
+    if len(shown):
+        print(shown.to_string(index=False))
+    if args.output:
+        report.to_csv(args.output, index=False)
+    print(f"Checked {len(report)} graphs ({report['nodes'].sum() if len(report) else 0} nodes) in {elapsed:.3f}s, {len(broken)} with connectivity problems")
+    print_timings(args)
+    return 2 if len(broken) or len(report) < len(graphs) else 0
+
+# Graphs of a version by graph id: one graph file, a directory or glob of graph files, or a level dataset (.npz)
+def load_graph_version(path, workers=None):
+    if path.lower().endswith(".npz"):
+        graph_ids, graphs = load_level_graphs(path)
+        return dict(zip(graph_ids, graphs))
+    graph_files = find_graph_files([path])
+    graphs = parse_graphs(graph_files, max_workers=workers, use_processes=True) if len(graph_files) > 1 else [select_file(graph_file) for graph_file in graph_files]
+    versions = {}
+    for path, graph in zip(graph_files, graphs):
+        if graph is None:
+            print(f"Failed to parse {path}", file=sys.stderr)
+            continue
+        versions[graph_id_from_filename(path) or os.path.basename(path)] = graph
+    return versions
+
+def diff_versions(args):
+    start_time = time.perf_counter()
+    old_graphs = load_graph_version(args.old, args.workers)
+    new_graphs = load_graph_version(args.new, args.workers)
+    if not old_graphs or not new_graphs:
+        print("No graph files found", file=sys.stderr)
+        return 1
+    load_time = time.perf_counter() - start_time
+    if len(old_graphs) == 1 and len(new_graphs) == 1:
+        # Two versions of one file are compared whatever their names
+        old_graphs = dict(zip(new_graphs, old_graphs.values()))
+
+    start_time = time.perf_counter()
+    summaries = []
+    changes = []
+    for graph_id in sorted(set(old_graphs) & set(new_graphs), key=str):
+        diff = diff_graphs(old_graphs[graph_id], new_graphs[graph_id], args.tolerance)
+        summaries.append(diff.summary(graph_id))
+        if diff:
+            changes.append(diff.to_dataframe(graph_id))
+    elapsed = time.perf_counter() - start_time
+
+    missing = [(graph_id, "new") for graph_id in set(old_graphs) - set(new_graphs)] + [(graph_id, "old") for graph_id in set(new_graphs) - set(old_graphs)]
+    for graph_id, version in sorted(missing, key=str):
+        print(f"Graph {graph_id} is missing from the {version} version", file=sys.stderr)
+    report = pd.DataFrame(summaries)
+    changed = report[report.drop(columns="graph").sum(axis=1) > 0] if len(report) else report
+    if len(changed):
+        print(changed.to_string(index=False))
+    if args.output and changes:
+        pd.concat(changes, ignore_index=True).to_csv(args.output, index=False)
+    print(f"Compared {len(report)} graphs ({sum(len(graph.nodes) for graph in new_graphs.values())} nodes) in {elapsed:.3f}s after loading in {load_time:.3f}s, {len(changed)} changed")
+    print_timings(args)
+    return 1 if len(changed) or missing else 0
+
+def generate_graphs(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    for index, node_count in enumerate(args.nodes):
+        filename = os.path.join(args.output_dir, f"graph{args.first_id + index}.dat")
+        file_size = write_synthetic_graph(filename, node_count, args.seed + index, args.extra_links)
+        print(f"Wrote {filename} ({node_count} nodes, {file_size / 1e6:.2f} MB)")
+    return 0
+
+def print_timings(args):
+    if args.profile:
+        print()
+        print(profiler.format_summary())
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Project IGI Graph Viewer command line tool")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parse_parser = commands.add_parser("parse", help="Parse graph files into one level dataset")
+    parse_parser.add_argument("inputs", nargs="+", help="Graph files, directories or glob patterns like 'level1/graph*.dat'")
+    parse_parser.add_argument("-o", "--output", required=True, help="Output dataset file (.npz)")
+    parse_parser.add_argument("--level", type=int, help="Game level number stored with the dataset")
+    parse_parser.add_argument("--workers", type=int, help="Number of parser processes (default: CPU count)")
+    parse_parser.add_argument("--profile", action="store_true", help="Print per-stage timings of the parser")
+    parse_parser.set_defaults(func=parse_level)
+
+    export_parser = commands.add_parser("export", help="Export a level dataset or a graph file to JSON, NDJSON, NPZ, Parquet or Arrow")
+    export_parser.add_argument("input", help="Level dataset (.npz) written by parse or a graph .dat file")
+    export_parser.add_argument("-o", "--output", required=True, help="Output file, the format is taken from the extension (.json, .ndjson, .npz, .parquet, .arrow)")
+    export_parser.add_argument("--profile", action="store_true", help="Print per-stage timings")
+    export_parser.set_defaults(func=export_data)
+
+    areas_parser = commands.add_parser("prefetch-areas", help="Download the area data of all levels for offline use")
+    areas_parser.add_argument("--levels", type=int, nargs="+", help="Only these levels (default: all levels)")
+    areas_parser.add_argument("--base-url", help="URL of the area files with {} for the level number")
+    areas_parser.add_argument("--refresh", action="store_true", help="Revalidate local copies even if they are not expired")
+    areas_parser.set_defaults(func=prefetch_areas)
+
+    snap_parser = commands.add_parser("snap", help="Find the nearest graph nodes of many game world coordinates")
+    snap_parser.add_argument("input", help="Level dataset (.npz) written by parse or a graph .dat file")
+    snap_parser.add_argument("points", help="CSV file with x,y,z in the first three columns")
+    snap_parser.add_argument("-o", "--output", help="Output CSV file (default: standard output)")
+    snap_parser.add_argument("-k", type=int, default=1, help="Number of nearest nodes per point")
+    snap_parser.add_argument("--skip-rows", type=int, default=0, help="Header lines to skip in the points file")
+    snap_parser.set_defaults(func=snap_points)
+
+    check_parser = commands.add_parser("check", help="Report components, isolated nodes, dangling edges and degrees of every graph")
+    check_parser.add_argument("inputs", nargs="+", help="Graph files, directories, glob patterns or a level dataset (.npz)")
+    check_parser.add_argument("-o", "--output", help="Also write the report to this CSV file")
+    check_parser.add_argument("--only-broken", action="store_true", help="Only print graphs with connectivity problems")
+    check_parser.add_argument("--workers", type=int, help="Number of parser processes (default: CPU count)")
+    check_parser.add_argument("--profile", action="store_true", help="Print per-stage timings")
+    check_parser.set_defaults(func=check_graphs)
+
+    diff_parser = commands.add_parser("diff", help="Report added, removed, moved and changed nodes and links between two versions of graphs")
+    diff_parser.add_argument("old", help="Original graph file, directory of graph files or level dataset (.npz)")
+    diff_parser.add_argument("new", help="Edited version, graphs of directories and datasets are paired by graph id")
+    diff_parser.add_argument("-o", "--output", help="Write every change to this CSV file")
+    diff_parser.add_argument("--tolerance", type=float, default=DEFAULT_POSITION_TOLERANCE, help="Distance a node has to move to be reported as moved")
+    diff_parser.add_argument("--workers", type=int, help="Number of parser processes (default: CPU count)")
+    diff_parser.add_argument("--profile", action="store_true", help="Print per-stage timings")
+    diff_parser.set_defaults(func=diff_versions)
+
+    generate_parser = commands.add_parser("generate", help="Write synthetic graph files for testing and benchmarks")
+    generate_parser.add_argument("nodes", type=int, nargs="+", help="Node count of each generated graph")
+    generate_parser.add_argument("-o", "--output-dir", required=True, help="Directory the graph files are written to")
+    generate_parser.add_argument("--first-id", type=int, default=9000, help="Graph id of the first file, ids count up from it")
+    generate_parser.add_argument("--seed", type=int, default=0, help="Seed of the first graph, each next graph uses the next seed")
+    generate_parser.add_argument("--extra-links", type=float, default=1.0, help="Random links per node on top of the spanning links")
+    generate_parser.set_defaults(func=generate_graphs)
+    return parser
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    profiler.enable(getattr(args, "profile", False))
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
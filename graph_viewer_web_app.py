@@ -6,121 +6,164 @@ date : 12/08/2023
 author : HeavenHM
 """
 
-import os
 import streamlit as st
-import plotly.graph_objects as go
-import json
+import io
 import logging
-from libs.graph_data_parser import GraphData,select_file
-from libs.graph_area_parser import GraphArea
-from graph_const import material_colors, material_mapping
-import tempfile
+import threading
+from libs.graph_data_parser import create_parse_pool, parse_graphs
+from libs.graph_analysis import analyze_graph
+from libs.graph_cache import GraphCache, GraphMemoryStore
+from libs.graph_diff import DEFAULT_POSITION_TOLERANCE, diff_graphs
+from libs.graph_figure import DEFAULT_POINT_BUDGET, LevelScene, build_graph_figure, crop_graph, graph_bounds
+from libs.graph_paths import get_router
+from libs.graph_export import export_format_for, export_graph
+from libs.graph_profiler import GraphProfiler, profiler
+from libs.graph_area_parser import GAME_LEVELS, GraphArea
+from graph_const import material_mapping
 import pandas as pd
 
 logging.basicConfig(filename='graph_gen_app.log', level=logging.DEBUG)
 
-def get_edges(data):
-    edge_x = []
-    edge_y = []
-    edge_z = []
-    for item in data:
-        if "edges" in item:
-            for edge in item["edges"]:
-                target_node = next((node for node in data if node["id"] == edge), None)
-                if target_node:
-                    edge_x.extend([item["x"], target_node["x"], None])
-                    edge_y.extend([item["y"], target_node["y"], None])
-                    edge_z.extend([item["z"], target_node["z"], None])
-    return edge_x, edge_y, edge_z
-
-def prepare_node_colors_and_sizes(data, node_radius_size):
-    colors = []
-    sizes = []
-    for item in data:
-        material = item['material']
-        color = material_colors.get(material_mapping.get(material, 'UNKNOWN'), 'purple')
-        colors.append(color)
-        sizes.append(item['radius'] * node_radius_size)
-    return colors, sizes
-
-def prepare_hover_text(data, show_links, show_material, show_gamma_radius, show_criteria, show_position):
-    text_data = []
-    for item in data:
-        text = f"Node ID: {item['id']}"
-        if show_links:
-            text += f"<br>Links: {', '.join(map(str, item['edges']))}"
-        if show_material:
-            text += f"<br>Material: {item['material']}"
-        if show_gamma_radius:
-            text += f"<br>Gamma: {item['gamma']}<br>Radius: {item['radius']}"
-        if show_criteria:
-            text += f"<br>Criteria: {item['criteria']}"
-        if show_position:
-            text += f"<br>Position: ({item['x']}, {item['y']}, {item['z']})"
-        text_data.append(text)
-    return text_data
-
-def plot_graph(data):
+# Download formats offered in Export Settings
+EXPORT_EXTENSIONS = {'JSON': '.json', 'NDJSON': '.ndjson', 'NPZ': '.npz', 'Parquet': '.parquet', 'Arrow': '.arrow'}
+
+def export_graph_bytes(graph, file_name):
+    export_buffer = io.BytesIO()
+    export_graph(export_buffer, graph, export_format_for(file_name))
+    return export_buffer.getvalue()
+
+# Path between the start and goal node set in Path Settings, shown below the plot when the graph has both nodes
+def find_graph_path(graph):
+    if not st.session_state.find_path:
+        return None
+    start_id, goal_id = st.session_state.path_start, st.session_state.path_goal
+    if (graph.nodes['id'] == start_id).any() and (graph.nodes['id'] == goal_id).any():
+        edge_types = [int(edge_type) for edge_type in st.session_state.path_edge_types.replace(',', ' ').split()] or None
+        path = get_router(graph).find_path(start_id, goal_id, edge_types, st.session_state.path_materials or None)
+        if path is None:
+            st.warning(f"No path from node {start_id} to node {goal_id}")
+        else:
+            st.caption(f"Path from node {start_id} to node {goal_id}: {path.hops} links, distance {path.distance:.2f}, {path.visited} nodes searched")
+        return path
+    return None
+
+def plot_graph(data, diff=None, original=None):
+    path = find_graph_path(data)
     if st.session_state.graph_type == "Scatter":
-        plot_3d(data, plot_type='scatter', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode)
+        plot_3d(data, plot_type='scatter', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode, point_budget=st.session_state.point_budget if st.session_state.level_of_detail else None, path=path, diff=diff, original=original)
     elif st.session_state.graph_type == "Surface":
-        plot_3d(data, plot_type='surface', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode)
+        plot_3d(data, plot_type='surface', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode, point_budget=st.session_state.point_budget if st.session_state.level_of_detail else None, path=path, diff=diff, original=original)
     elif st.session_state.graph_type == "Line":
-        plot_3d(data, plot_type='line', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode)
+        plot_3d(data, plot_type='line', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode, point_budget=st.session_state.point_budget if st.session_state.level_of_detail else None, path=path, diff=diff, original=original)
     elif st.session_state.graph_type == "Mesh":
-        plot_3d(data, plot_type='mesh', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode)
+        plot_3d(data, plot_type='mesh', symbol=st.session_state.node_symbol, show_links=st.session_state.show_links, show_material=st.session_state.show_material, show_gamma_radius=st.session_state.show_gamma_radius, show_criteria=st.session_state.show_criteria, show_position=st.session_state.node_position, node_radius_size=st.session_state.node_radius_size, scene_aspectmode=st.session_state.scene_aspectmode, point_budget=st.session_state.point_budget if st.session_state.level_of_detail else None, path=path, diff=diff, original=original)
 
-def plot_3d(data, plot_type='scatter', symbol=None, show_links=False, show_material=False, show_gamma_radius=False, show_criteria=False,show_position=False, node_radius_size=50,scene_aspectmode='cube'):
+def plot_3d(graph, plot_type='scatter', symbol=None, show_links=False, show_material=False, show_gamma_radius=False, show_criteria=False,show_position=False, node_radius_size=50,scene_aspectmode='cube', point_budget=None, path=None, diff=None, original=None):
     logging.info(f"Generating 3D {plot_type} plot")
-    x_data = [item['x'] for item in data]
-    y_data = [item['y'] for item in data]
-    z_data = [item['z'] for item in data]
-    
-    # Get edges only if show_links is True
-    edge_x, edge_y, edge_z = get_edges(data) if show_links else ([], [], [])
-    
-    hover_texts = prepare_hover_text(data, show_links, show_material, show_gamma_radius, show_criteria,show_position)
-    colors, sizes = prepare_node_colors_and_sizes(data, node_radius_size)
-    
-    fig = go.Figure()
+    # Links are only drawn when they are shown, the figure parts are kept in the graph store
+    fig, level_of_detail = build_graph_figure(graph, get_graph_store(), plot_type, symbol, show_links, show_material, show_gamma_radius, show_criteria, show_position, node_radius_size, point_budget,
+                                              draw_links=show_links, scene_aspectmode=scene_aspectmode, path=path, diff=diff, original=original)
+    if level_of_detail and level_of_detail.decimated:
+        st.caption(f"Showing {len(level_of_detail)} clusters of {level_of_detail.node_count} nodes, select a graph or region for full detail")
+    if fig is None:
+        return
     fig.update_layout(scene=dict(xaxis=dict(title=dict(text='X')), yaxis=dict(title=dict(text='Y')), zaxis=dict(title=dict(text='Z'))))
-    fig.layout.scene.aspectmode = scene_aspectmode
     fig.layout.width = 800
     fig.layout.height = 600
     
-    if plot_type == 'scatter':
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='markers', marker=dict(color=colors, size=sizes, symbol=symbol, sizemode='diameter'), text=hover_texts, hoverinfo='text'))
-    elif plot_type == 'surface':
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='markers', marker=dict(color=colors, size=sizes, sizemode='diameter'), text=hover_texts, hoverinfo='text'))
-    elif plot_type == 'line':
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='lines+markers', marker=dict(color=colors, size=sizes, sizemode='diameter'), line=dict(color='red'), text=hover_texts, hoverinfo='text'))
-    elif plot_type == 'mesh':
-        intensity = list(range(len(colors)))
-        fig.add_trace(go.Mesh3d(x=x_data, y=y_data, z=z_data, opacity=0.5, hoverinfo='text', hovertext=hover_texts, intensity=intensity, colorscale='Viridis', cmin=0, cmax=len(colors)-1))
-        fig.add_trace(go.Scatter3d(x=x_data, y=y_data, z=z_data, mode='markers', marker=dict(color=colors, size=sizes, sizemode='diameter'), text=hover_texts, hoverinfo='text'))
-    else:
-        logging.error(f"Invalid plot type: {plot_type}")
-        return
-
-    # Add edges only if show_links is True
-    if show_links:
-        fig.add_trace(go.Scatter3d(x=edge_x, y=edge_y, z=edge_z, mode='lines', line=dict(color='red')))
-    
     # Embed the Plotly graph in the Streamlit app
-    st.plotly_chart(fig)
+    with profiler.stage("serialization", records=len(level_of_detail.graph if level_of_detail else graph)):
+        st.plotly_chart(fig)
 
     logging.info(f"3D {plot_type} plot generated successfully")
 
 
 
-def adjust_node_height_data(data, node_height):
+# Shared by all sessions, the area data of every level is downloaded in the background when the server starts
+@st.cache_resource
+def get_area_catalog():
+    area_catalog = GraphArea.get_catalog()
+    threading.Thread(target=area_catalog.prefetch, daemon=True).start()
+    return area_catalog
+
+# Streamlit runs the script again in a fresh module on every rerun, caches that have to outlive a rerun are resources
+@st.cache_resource
+def get_graph_cache():
+    return GraphCache()
+
+# One pool of parser processes for the server, started once so reruns that parse don't pay for starting workers
+@st.cache_resource
+def get_parse_pool():
+    return create_parse_pool()
+
+# Parsed uploads with their derived views, and the figure parts, scenes and diffs built from them by graph content
+# and settings, kept in memory and shared by all sessions within one budget
+@st.cache_resource
+def get_graph_store():
+    return GraphMemoryStore()
+
+# SHA-256 of every upload, hashed once per uploaded file of the session
+def get_upload_digests(uploaded_files):
+    known_digests = st.session_state.upload_digests
+    digests = {uploaded_file.file_id: known_digests.get(uploaded_file.file_id) or GraphCache.content_key(uploaded_file.getvalue()) for uploaded_file in uploaded_files}
+    st.session_state.upload_digests = digests  # Forget the files that were removed from the uploader
+    return [digests[uploaded_file.file_id] for uploaded_file in uploaded_files]
+
+# Pick what the combined scene shows, all or some graphs of the level merged into one chart and, when the
+# scene is over the point budget, one graph or region of it in full detail
+def select_detail_scene(graphs, graph_names):
+    scene = get_graph_store().get_or_build(("level scene", tuple(graph.content_key for graph in graphs), tuple(graph_names)), lambda: LevelScene(graphs, graph_names))
+    # Chosen by upload order like the diff versions, uploads of a level can share a file name
+    uploads = list(range(len(graph_names)))
+    upload_label = lambda index: f"{index + 1}. {graph_names[index]}"
+    scene_uploads = st.multiselect('Scene Graphs', uploads, uploads, format_func=upload_label)
+    if len(scene_uploads) > 1:
+        st.caption('Node IDs are offset per graph: ' + ', '.join(f"{upload_label(index)} +{scene.id_offsets[index]}" for index in scene_uploads))
+    combined_data = scene.select(scene_uploads)
+    if not st.session_state.level_of_detail or len(combined_data) <= st.session_state.point_budget:
+        return combined_data
+    detail_options = ['Whole Level'] + scene_uploads + ['Region']
+    detail = st.selectbox('Full Detail', detail_options, format_func=lambda option: upload_label(option) if isinstance(option, int) else option)
+    if isinstance(detail, int):
+        return scene.select([detail])
+    if detail == 'Region':
+        low, high = graph_bounds(combined_data)
+        x_range = st.slider('Region X', float(low[0]), float(high[0]), (float(low[0]), float(high[0])))
+        y_range = st.slider('Region Y', float(low[1]), float(high[1]), (float(low[1]), float(high[1])))
+        return crop_graph(combined_data, (x_range[0], y_range[0], low[2]), (x_range[1], y_range[1], high[2]))
+    return combined_data
+
+# Changes from the original to the edited upload chosen in Diff Settings, the diff is taken on the graphs as parsed
+# and shown on the graphs as plotted. Returns the edited graph, the diff and the original graph to plot.
+def show_graph_diff(parsed_graphs, plotted_graphs, graph_names):
+    # Chosen by upload order since both versions usually have the same file name
+    uploads = range(len(graph_names))
+    original = st.selectbox('Original Version', uploads, index=0, format_func=lambda index: f"{index + 1}. {graph_names[index]}")
+    edited = st.selectbox('Edited Version', uploads, index=1, format_func=lambda index: f"{index + 1}. {graph_names[index]}")
+    old_graph, new_graph = parsed_graphs[original], parsed_graphs[edited]
+    tolerance = st.session_state.diff_tolerance
+    diff = get_graph_store().get_or_build(("diff", old_graph.content_key, new_graph.content_key, tolerance), lambda: diff_graphs(old_graph, new_graph, tolerance))
+    st.subheader(f"Changes from {original + 1}. {graph_names[original]} to {edited + 1}. {graph_names[edited]}")
+    st.dataframe(pd.DataFrame([diff.summary()]), hide_index=True)
+    if diff:
+        st.dataframe(diff.to_dataframe(), hide_index=True)
+    return plotted_graphs[edited], diff, plotted_graphs[original]
+
+def adjust_node_height_data(graph, node_height, graph_store=None, digest=None):
     if not node_height:
-        for item in data:
-            item["z"] = 0  # Set Z position to 0 or any other default value
-    return data
+        if graph_store is not None:
+            return graph_store.get_view(digest, "flat height", graph.with_flat_height)
+        graph = graph.with_flat_height()
+    return graph
 
+# Every rerun records its timings in a profiler of its own, the shared one is never switched on or off by a session
 def main():
+    with profiler.recording_into(GraphProfiler()) as run_profiler:
+        show_graph_viewer(run_profiler)
+
+def show_graph_viewer(run_profiler):
     #st.title('Project IGI Graph Viewer')
+    area_catalog = get_area_catalog()
 
     # Initialize session state variables if they don't exist
     if 'show_links' not in st.session_state:
@@ -151,6 +194,32 @@ def main():
         st.session_state.show_area_data = False
     if 'single_space' not in st.session_state:
         st.session_state.single_space = False
+    if 'show_timings' not in st.session_state:
+        st.session_state.show_timings = profiler.enabled
+    if 'level_of_detail' not in st.session_state:
+        st.session_state.level_of_detail = True
+    if 'point_budget' not in st.session_state:
+        st.session_state.point_budget = DEFAULT_POINT_BUDGET
+    if 'show_connectivity' not in st.session_state:
+        st.session_state.show_connectivity = False
+    if 'find_path' not in st.session_state:
+        st.session_state.find_path = False
+    if 'path_start' not in st.session_state:
+        st.session_state.path_start = 1
+    if 'path_goal' not in st.session_state:
+        st.session_state.path_goal = 2
+    if 'path_edge_types' not in st.session_state:
+        st.session_state.path_edge_types = ''
+    if 'path_materials' not in st.session_state:
+        st.session_state.path_materials = []
+    if 'export_format' not in st.session_state:
+        st.session_state.export_format = 'None'
+    if 'compare_versions' not in st.session_state:
+        st.session_state.compare_versions = False
+    if 'diff_tolerance' not in st.session_state:
+        st.session_state.diff_tolerance = DEFAULT_POSITION_TOLERANCE
+    if 'upload_digests' not in st.session_state:
+        st.session_state.upload_digests = {}
 
     # Sidebar header
     st.sidebar.header('Project IGI Graph Viewer')
@@ -166,8 +235,12 @@ def main():
     with st.sidebar.expander('View Settings',expanded=False):
         st.session_state.show_table_data = st.checkbox('Node Table', st.session_state.show_table_data)
         st.session_state.show_area_data = st.checkbox('Area Table', st.session_state.show_area_data)
+        st.session_state.show_connectivity = st.checkbox('Connectivity Report', st.session_state.show_connectivity)
         st.session_state.show_links = st.checkbox('Node Links', st.session_state.show_links)
         st.session_state.single_space = st.checkbox('Single Space', False)
+        st.session_state.show_timings = st.checkbox('Pipeline Timings', st.session_state.show_timings)
+        st.session_state.level_of_detail = st.checkbox('Level of Detail', st.session_state.level_of_detail)
+        st.session_state.point_budget = st.number_input('Point Budget', 1000, 1000000, st.session_state.point_budget, step=1000)
         st.session_state.scene_aspectmode = st.selectbox('Aspect Mode', ['auto', 'cube', 'data', 'manual'], index=['auto', 'cube', 'data', 'manual'].index(st.session_state.scene_aspectmode))
     
     with st.sidebar.expander('Graph & Node Settings',expanded=False):
@@ -176,60 +249,97 @@ def main():
         st.session_state.graph_type = st.selectbox('Graph Type', ['Scatter', 'Surface', 'Line', 'Mesh'], index=['Scatter', 'Surface', 'Line', 'Mesh'].index(st.session_state.graph_type))
         st.session_state.node_symbol = st.selectbox('Node Symbol', ['circle', 'circle-open', 'cross', 'diamond', 'diamond-open', 'square', 'square-open', 'x'], index=['circle', 'circle-open', 'cross', 'diamond', 'diamond-open', 'square', 'square-open', 'x'].index(st.session_state.node_symbol))
 
+    with st.sidebar.expander('Path Settings', expanded=False):
+        st.session_state.find_path = st.checkbox('Find Path', st.session_state.find_path)
+        st.session_state.path_start = st.number_input('Start Node ID', 1, None, st.session_state.path_start)
+        st.session_state.path_goal = st.number_input('Goal Node ID', 1, None, st.session_state.path_goal)
+        st.session_state.path_edge_types = st.text_input('Edge Types (all if empty)', st.session_state.path_edge_types)
+        st.session_state.path_materials = st.multiselect('Materials (all if empty)', sorted(set(material_mapping.values())), st.session_state.path_materials)
+
+    with st.sidebar.expander('Diff Settings', expanded=False):
+        st.session_state.compare_versions = st.checkbox('Compare Versions', st.session_state.compare_versions)
+        st.session_state.diff_tolerance = st.number_input('Position Tolerance', 0.0, None, st.session_state.diff_tolerance, format='%.3f')
+
+    with st.sidebar.expander('Export Settings', expanded=False):
+        export_formats = ['None'] + list(EXPORT_EXTENSIONS)
+        st.session_state.export_format = st.selectbox('Export Format', export_formats, index=export_formats.index(st.session_state.export_format))
+
     with st.sidebar.expander('Game Settings', expanded=False):
-        st.session_state.game_level = st.selectbox('Game Level', list(range(1, 15)), index=st.session_state.game_level - 1)
+        st.session_state.game_level = st.selectbox('Game Level', GAME_LEVELS, index=GAME_LEVELS.index(st.session_state.game_level))
         
+    # Timings are recorded per rerun
+    run_profiler.enable(st.session_state.show_timings)
+
     # File uploader
     uploaded_files = st.file_uploader('Upload Graph Files', type=['dat'], accept_multiple_files=True)
 
     # Display the area data in a table if the checkbox is checked
     if st.session_state.show_area_data:
-        area_json_data = GraphArea.get_json_data(st.session_state.game_level)
-        data = json.loads(area_json_data)
-        df = pd.DataFrame(data)
-        st.subheader(f"Level {st.session_state.game_level} Area Data")
-        st.dataframe(df)
+        try:
+            df = pd.DataFrame(area_catalog.get_entries(st.session_state.game_level))
+            st.subheader(f"Level {st.session_state.game_level} Area Data")
+            st.dataframe(df)
+        except ValueError as e:
+            st.error(str(e))
     
     all_data = []
+    parsed_data = []
+    graph_names = []
+    connectivity_reports = []
 
-    for uploaded_file in uploaded_files:
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(uploaded_file.getvalue())
-            uploaded_path = temp_file.name
+    # Graphs already in the store are reused, the rest are parsed at once, each file in its own worker process
+    graph_store = get_graph_store()
+    digests = get_upload_digests(uploaded_files)
+    graphs = graph_store.get_or_parse_many([uploaded_file.getvalue() for uploaded_file in uploaded_files], lambda buffers: parse_graphs(buffers, cache=get_graph_cache(), executor=get_parse_pool()), digests)
 
-        try:
-            json_data = select_file(uploaded_path)
-            if not json_data:
-                st.error(f"Failed to parse the uploaded file: {uploaded_file.name}")
-            else:
-                data = json.loads(json_data)
-                data = adjust_node_height_data(data, st.session_state.node_height)
-                all_data.append(data)
-            
-             # Display the data in a table if the checkbox is checked
-                if st.session_state.show_table_data:
-                    df = pd.DataFrame(data)
-                    st.subheader(f"Graph # {uploaded_file.name.split('graph')[1].split('.')[0]} Data")
-                    st.dataframe(df)
-                    
-            # Set the title of Plot and the page
-            graph_id = int(uploaded_file.name.split('graph')[1].split('.')[0])
-            graph_name = GraphArea.get_area_by_graph_id(st.session_state.game_level, graph_id) if GraphArea.get_area_by_graph_id(st.session_state.game_level, graph_id) else 'Unknown Area'
-            plot_name = 'Graph #' + str(graph_id) + '\t' + graph_name
-            # set this name to the title of plotting graph
-            st.title(plot_name)
-            # set title font size
-            st.markdown('<style>h1{font-size: 20px;}</style>', unsafe_allow_html=True)
-            
-        finally:
-            os.remove(uploaded_path)
-
-    if st.session_state.single_space:
-        combined_data = [item for sublist in all_data for item in sublist]
-        plot_graph(combined_data)
+    for uploaded_file, digest, graph in zip(uploaded_files, digests, graphs):
+        if graph is None:
+            st.error(f"Failed to parse the uploaded file: {uploaded_file.name}")
+        else:
+            if st.session_state.export_format != 'None':
+                export_name = uploaded_file.name.rsplit('.', 1)[0] + EXPORT_EXTENSIONS[st.session_state.export_format]
+                export_data = graph_store.get_view(digest, ("export", st.session_state.export_format), lambda: export_graph_bytes(graph, export_name))
+                st.download_button(f"Download {uploaded_file.name} as {st.session_state.export_format}", export_data, file_name=export_name, key=f"export_{uploaded_file.file_id}")
+            parsed_data.append(graph)
+            graph = adjust_node_height_data(graph, st.session_state.node_height, graph_store, digest)
+            all_data.append(graph)
+            graph_names.append(uploaded_file.name)
+            if st.session_state.show_connectivity:
+                connectivity_reports.append({"graph": uploaded_file.name, **graph_store.get_view(digest, "connectivity", lambda: analyze_graph(graph))})
+        
+         # Display the data in a table if the checkbox is checked
+            if st.session_state.show_table_data:
+                df = graph_store.get_view(digest, ("table", st.session_state.node_height), graph.to_dataframe)
+                st.subheader(f"Graph # {uploaded_file.name.split('graph')[1].split('.')[0]} Data")
+                st.dataframe(df)
+                
+        # Set the title of Plot and the page
+        graph_id = int(uploaded_file.name.split('graph')[1].split('.')[0])
+        graph_name = area_catalog.get_area_by_graph_id(st.session_state.game_level, graph_id) or 'Unknown Area'
+        plot_name = 'Graph #' + str(graph_id) + '\t' + graph_name
+        # set this name to the title of plotting graph
+        st.title(plot_name)
+        # set title font size
+        st.markdown('<style>h1{font-size: 20px;}</style>', unsafe_allow_html=True)
+
+    # Components, isolated nodes and dangling edges of every uploaded graph
+    if st.session_state.show_connectivity and all_data:
+        st.subheader("Connectivity Report")
+        st.dataframe(pd.DataFrame(connectivity_reports), hide_index=True)
+
+    if st.session_state.compare_versions and len(all_data) == 1:
+        st.warning("Upload the original and the edited version of a graph to compare them")
+    if st.session_state.compare_versions and len(all_data) > 1:
+        plot_graph(*show_graph_diff(parsed_data, all_data, graph_names))
+    elif st.session_state.single_space:
+        plot_graph(select_detail_scene(all_data, graph_names))
     else:
         for data in all_data:
             plot_graph(data)
 
+    if st.session_state.show_timings:
+        st.subheader("Pipeline Timings")
+        st.dataframe(pd.DataFrame(run_profiler.summary_rows()))
+
 if __name__ == "__main__":
     main()
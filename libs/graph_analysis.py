@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from libs.graph_data_parser import linking_edges, lookup_node_rows, unique_link_rows
+from libs.graph_profiler import profiler
+
+# Node rows of every edge, -1 where the edge points at a node id that doesn't exist
+def edge_endpoint_rows(graph):
+    node_ids = graph.nodes["id"]
+    return lookup_node_rows(node_ids, graph.edges["source"]), lookup_node_rows(node_ids, graph.edges["target"])
+
+# Component number of every node, numbered from 0 in the order of their first node.
+# Union-find on whole arrays: every link hooks the root with the higher label onto the lower one, then paths
+# are compressed by pointer jumping until every node points at its root.
+def label_components(node_count, low_rows, high_rows):
+    labels = np.arange(node_count)
+    while True:
+        low_labels = labels[low_rows]
+        high_labels = labels[high_rows]
+        changed = low_labels != high_labels
+        if not changed.any():
+            break
+        np.minimum.at(labels, np.maximum(low_labels, high_labels)[changed], np.minimum(low_labels, high_labels)[changed])
+        while True:
+            parents = labels[labels]
+            if np.array_equal(parents, labels):
+                break
+            labels = parents
+    _, first_rows, components = np.unique(labels, return_index=True, return_inverse=True)
+    # Renumber so component 0 holds the first node
+    order = np.argsort(np.argsort(first_rows))
+    return order[components.ravel()]
+
+# Distinct linked nodes of every node, links to missing nodes and to the node itself are not counted
+def node_degrees(node_count, low_rows, high_rows):
+    return np.bincount(low_rows, minlength=node_count) + np.bincount(high_rows, minlength=node_count)
+
+def degree_histogram(graph):
+    source_rows, target_rows = edge_endpoint_rows(graph)
+    return np.bincount(node_degrees(len(graph.nodes), *unique_link_rows(source_rows, target_rows, len(graph.nodes))))
+
+# Rows of the edges that point at a node id that doesn't exist
+def find_dangling_edges(graph):
+    source_rows, target_rows = edge_endpoint_rows(graph)
+    return np.flatnonzero((source_rows < 0) | (target_rows < 0))
+
+# One report row with the connectivity problems of a graph
+def analyze_graph(graph, graph_id=None):
+    with profiler.stage("analysis", records=len(graph.nodes)):
+        node_count = len(graph.nodes)
+        source_rows, target_rows = edge_endpoint_rows(graph)
+        low_rows, high_rows = unique_link_rows(source_rows, target_rows, node_count)
+        degrees = node_degrees(node_count, low_rows, high_rows)
+        components = label_components(node_count, low_rows, high_rows)
+        component_sizes = np.bincount(components)
+        linked = linking_edges(source_rows, target_rows)
+        report = {} if graph_id is None else {"graph": graph_id}
+        report.update({
+            "nodes": node_count,
+            "edges": len(graph.edges),
+            "components": len(component_sizes),
+            "largest component": int(component_sizes.max()) if node_count else 0,
+            "isolated nodes": int((degrees == 0).sum()),
+            "dangling edges": int(((source_rows < 0) | (target_rows < 0)).sum()),
+            "self links": int(((source_rows == target_rows) & (source_rows >= 0)).sum()),
+            "duplicate links": int(linked.sum() - len(low_rows)),
+            "duplicate ids": node_count - len(np.unique(graph.nodes["id"])),
+            "min degree": int(degrees.min()) if node_count else 0,
+            "mean degree": round(float(degrees.mean()), 2) if node_count else 0.0,
+            "max degree": int(degrees.max()) if node_count else 0,
+        })
+        return report
+
+# Report table with one row per graph, graphs that failed to parse are left out
+def analyze_graphs(graph_ids, graphs):
+    return pd.DataFrame([analyze_graph(graph, graph_id) for graph_id, graph in zip(graph_ids, graphs) if graph is not None])
+
+def is_broken(report):
+    return report["components"] > 1 or report["isolated nodes"] > 0 or report["dangling edges"] > 0 or report["duplicate ids"] > 0
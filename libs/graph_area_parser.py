@@ -1,16 +1,202 @@
 import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
 import requests
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_AREA_CACHE_DIR = os.path.join(os.environ.get("IGI_GRAPH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "igi-graph-viewer")), "areas")
+DEFAULT_AREA_TTL = 7 * 24 * 60 * 60
+DEFAULT_AREA_RETRY_INTERVAL = 60
+DEFAULT_AREA_TIMEOUT = 10
+GAME_LEVELS = list(range(1, 15))
+AREA_FILE_NAME = "graph_area_level{}.json"
+GRAPH_NAME_PATTERN = re.compile(r"#\s*(\d+)")
+
+# Area data of one level with lookups from graph id to area and from area to its graphs
+class AreaLevel:
+    def __init__(self, level, entries):
+        self.level = level
+        self.entries = entries
+        self.area_by_graph_id = {}
+        self.graphs_by_area = {}
+        for entry in entries:
+            match = GRAPH_NAME_PATTERN.search(entry["Graph"])
+            if match:
+                self.area_by_graph_id.setdefault(int(match.group(1)), entry["Area"])
+            self.graphs_by_area.setdefault(entry["Area"], []).append(entry["Graph"])
+
+# Loads the area data of every level once and keeps a local copy on disk that is refreshed after ttl seconds.
+# With offline set it only reads the local copy or the files in seed_dir and never touches the network.
+class AreaCatalog:
+    def __init__(self, base_url=None, cache_dir=DEFAULT_AREA_CACHE_DIR, ttl=DEFAULT_AREA_TTL, offline=False, seed_dir=None, retry_interval=DEFAULT_AREA_RETRY_INTERVAL, timeout=DEFAULT_AREA_TIMEOUT, retries=3):
+        self.base_url = base_url or os.environ.get("IGI_GRAPH_AREA_URL") or GraphArea.BASE_URL
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.retries = retries
+        self.session = None
+        self.failures = {}  # Level to the time loading it last failed, so a missing level isn't retried on every lookup
+        self.offline = offline or os.environ.get("IGI_GRAPH_OFFLINE", "") not in ("", "0")
+        self.seed_dir = seed_dir or os.environ.get("IGI_GRAPH_AREA_DIR")
+        self.levels = {}
+        self.lock = threading.Lock()
+        self.level_locks = defaultdict(threading.Lock)  # Levels load in parallel, each one only once
+
+    def cache_path(self, level):
+        return os.path.join(self.cache_dir, AREA_FILE_NAME.format(level))
+
+    def seed_path(self, level):
+        return os.path.join(self.seed_dir, AREA_FILE_NAME.format(level)) if self.seed_dir else None
+
+    def metadata_path(self, level):
+        return self.cache_path(level) + ".meta"
+
+    # One pooled session for all downloads, failed requests are retried with exponential backoff
+    def get_session(self):
+        with self.lock:
+            if self.session is None:
+                retry = Retry(total=self.retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=len(GAME_LEVELS), max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.session = session
+            return self.session
+
+    def get_level(self, level):
+        area_level = self.levels.get(level)
+        if area_level is None:
+            with self.lock:
+                level_lock = self.level_locks[level]
+            with level_lock:
+                area_level = self.levels.get(level)
+                if area_level is None:
+                    if time.time() - self.failures.get(level, float("-inf")) < self.retry_interval:
+                        raise ValueError(f"Failed to fetch data for level {level}")
+                    try:
+                        area_level = self.levels[level] = AreaLevel(level, self.load_entries(level))
+                    except ValueError:
+                        self.failures[level] = time.time()
+                        raise
+        return area_level
+
+    def load_entries(self, level):
+        cache_path = self.cache_path(level)
+        if os.path.exists(cache_path) and (self.offline or time.time() - os.path.getmtime(cache_path) < self.ttl):
+            return self.read_file(cache_path)
+
+        if not self.offline:
+            try:
+                return self.fetch_entries(level)
+            except Exception as e:
+                logging.warning(f"Failed to download area data for level {level}, using the local copy: {e}")
+
+        # Stale local copy or pre-seeded file when the network is not used or not reachable
+        for path in (cache_path, self.seed_path(level)):
+            if path and os.path.exists(path):
+                return self.read_file(path)
+        raise ValueError(f"Failed to fetch data for level {level}")
+
+    # Download the level, revalidating the local copy with its ETag and Last-Modified when there is one
+    def fetch_entries(self, level):
+        cache_path = self.cache_path(level)
+        headers = {}
+        if os.path.exists(cache_path):
+            metadata = self.read_metadata(level)
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        response = self.get_session().get(self.base_url.format(level), headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            os.utime(cache_path)  # Still current, start a new TTL period
+            return self.read_file(cache_path)
+        elif response.status_code == 200:
+            entries = response.json()
+            self.write_cache(level, entries, {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")})
+            return entries
+        else:
+            raise ValueError(f"Failed to fetch data for level {level}")
+
+    def read_metadata(self, level):
+        try:
+            with open(self.metadata_path(level), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def read_file(path):
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def write_cache(self, level, entries, metadata=None):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for path, content in ((self.cache_path(level), entries), (self.metadata_path(level), metadata or {})):
+                file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+                with os.fdopen(file_descriptor, "w") as file:
+                    json.dump(content, file)
+                os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not save area data for level {level}: {e}")
+
+    # Drop the loaded level so the next lookup reads it again, forcing a download unless offline
+    def refresh(self, level):
+        with self.lock:
+            level_lock = self.level_locks[level]
+        with level_lock:
+            self.levels.pop(level, None)
+            self.failures.pop(level, None)
+            if not self.offline and os.path.exists(self.cache_path(level)):
+                os.utime(self.cache_path(level), (0, 0))
+
+    # Load every level at once over the shared session, returns the levels that failed to load
+    def prefetch(self, levels=GAME_LEVELS, max_workers=8):
+        def load(level):
+            try:
+                self.get_level(level)
+                return None
+            except ValueError:
+                return level
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [level for level in executor.map(load, levels) if level is not None]
+
+    def get_entries(self, level):
+        return self.get_level(level).entries
+
+    def get_area_by_graph_id(self, level, graph_id):
+        try:
+            return self.get_level(level).area_by_graph_id.get(int(graph_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_graphs_by_area(self, level, area):
+        return self.get_level(level).graphs_by_area.get(area, [])
 
 class GraphArea:
     BASE_URL = "https://raw.githubusercontent.com/Jones-HM/IGI-Research-Data/main/Data/Graphs/Areas-JSON/graph_area_level{}.json"
+    catalog = None
+
+    @staticmethod
+    def get_catalog():
+        if GraphArea.catalog is None:
+            GraphArea.catalog = AreaCatalog()
+        return GraphArea.catalog
 
     @staticmethod
     def _fetch_data(level):
-        response = requests.get(GraphArea.BASE_URL.format(level))
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise ValueError(f"Failed to fetch data for level {level}")
+        return GraphArea.get_catalog().get_entries(level)
 
     @staticmethod
     def get_json_data(level):
@@ -55,12 +241,4 @@ class GraphArea:
 
     @staticmethod
     def get_area_by_graph_id(level, graph_id):
-        data = GraphArea._fetch_data(level)
-        try:
-            graph_name = f"Graph #{graph_id}"
-            for entry in data:
-                if entry["Graph"] == graph_name:
-                    return entry["Area"]
-            return None
-        except:
-            return None
+        return GraphArea.get_catalog().get_area_by_graph_id(level, graph_id)
@@ -0,0 +1,320 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from libs.graph_data_parser import PARSER_VERSION, NODE_DTYPE, EDGE_DTYPE, GraphAdjacency, GraphArrays, graphDatList
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("IGI_GRAPH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "igi-graph-viewer")), "graphs")
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+DEFAULT_MEMORY_BUDGET = int(os.environ.get("IGI_GRAPH_MEMORY_BUDGET_MB", 256)) * 1024 * 1024
+
+# Names of the directories parser_fingerprint() gives, the only ones remove_stale_entries may delete
+FINGERPRINT_DIR_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+# Changes whenever the parser version, record layout or result dtypes change so stale entries are never read
+def parser_fingerprint():
+    layout = [(graphDat.hex_bytes, graphDat.data_type, graphDat.size, graphDat.record_type) for graphDat in graphDatList]
+    fingerprint = repr((PARSER_VERSION, layout, NODE_DTYPE.descr, EDGE_DTYPE.descr))
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+# On-disk cache of parsed graphs keyed by the SHA-256 of the file contents, least recently used entries are evicted first
+class GraphCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.namespace_dir = os.path.join(cache_dir, parser_fingerprint())
+        self.remove_stale_entries()
+
+    # Only directories named like a parser fingerprint are removed, anything else under the cache root is left alone
+    def remove_stale_entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if path != self.namespace_dir and FINGERPRINT_DIR_PATTERN.match(name) and os.path.isdir(path):
+                logging.info(f"Removing graph cache of an older parser: {path}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def content_key(binary_data):
+        return hashlib.sha256(binary_data).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.namespace_dir, f"{key}.npz")
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with np.load(path) as entry:
+                adjacency = GraphAdjacency(entry["offsets"], entry["neighbours"], entry["edge_rows"])
+                max_nodes = int(entry["max_nodes"]) if entry["max_nodes"] >= 0 else None
+                graph = GraphArrays(entry["nodes"], entry["edges"], adjacency, max_nodes)
+            os.utime(path)  # Mark as recently used
+            return graph
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Dropping unreadable graph cache entry {path}: {e}")
+            self.remove(key)
+            return None
+
+    def put(self, key, graph):
+        os.makedirs(self.namespace_dir, exist_ok=True)
+        adjacency = graph.adjacency
+        max_nodes = graph.max_nodes if graph.max_nodes is not None else -1
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.namespace_dir, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                np.savez(file, nodes=graph.nodes, edges=graph.edges, offsets=adjacency.offsets, neighbours=adjacency.neighbours, edge_rows=adjacency.edge_rows, max_nodes=np.int64(max_nodes))
+            os.replace(temp_path, self.entry_path(key))
+        except OSError as e:
+            logging.warning(f"Could not write graph cache entry {key}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def remove(self, key):
+        try:
+            os.remove(self.entry_path(key))
+        except OSError:
+            pass
+
+    def get_or_parse(self, binary_data, parse):
+        key = self.content_key(binary_data)
+        graph = self.get(key)
+        if graph is None:
+            graph = parse()
+            if graph is not None:
+                self.put(key, graph)
+        return graph
+
+    def entries(self):
+        entries = []
+        if not os.path.isdir(self.namespace_dir):
+            return entries
+        for entry in os.scandir(self.namespace_dir):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        shutil.rmtree(self.namespace_dir, ignore_errors=True)
+
+# Approximate bytes held by a cached value, graphs count their arrays and the parts built from them so far, like the
+# links, the spatial index and the router, data frames their columns and other objects their attributes. Values whose id is in seen are
+# already counted and add nothing, like a stored graph that a figure part refers to.
+def estimate_size(value, seen=None):
+    seen = set() if seen is None else seen
+    if isinstance(value, (GraphArrays, np.ndarray)) or hasattr(value, "__dict__"):
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+    if isinstance(value, GraphArrays):
+        adjacency = value.adjacency
+        arrays = (value.nodes, value.edges, adjacency.offsets, adjacency.neighbours, adjacency.edge_rows)
+        return sum(estimate_size(array, seen) for array in arrays) + value.lazy_parts_nbytes()
+    if isinstance(value, np.ndarray):
+        # Object arrays, like hover text, hold references to strings that count too
+        return value.nbytes + (sum(map(sys.getsizeof, value.ravel())) if value.dtype == object else 0)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, list) and value and isinstance(value[0], (int, float, str, list)):
+        return estimate_list_size(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(item, seen) for item in value.values())
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_size(vars(value), seen)
+    return sys.getsizeof(value)
+
+# Bytes of a list of numbers or strings or of a list of number lists, like the links or the router lists. Numbers
+# all count as large as the first one so long lists aren't walked item by item.
+def estimate_list_size(values):
+    first = values[0]
+    if isinstance(first, list):
+        numbers = sum(map(len, values))
+        return sys.getsizeof(values) + sum(map(sys.getsizeof, values)) + numbers * sys.getsizeof(0.0)
+    if isinstance(first, str):
+        return sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+    return sys.getsizeof(values) + len(values) * sys.getsizeof(first)
+
+# A parsed graph in the memory store and the views derived from it, like the flat height graph or the table
+class GraphStoreEntry:
+    def __init__(self, graph):
+        self.graph = graph
+        self.views = {}
+        self.view_sizes = {}
+        self.size = estimate_size(graph)
+
+    # Graphs build their links, spatial index and router on first use, so graphs are measured again on every access,
+    # which only reads array sizes and lengths, while other views keep the size they had when they were built.
+    # Arrays a view shares with the graph count once.
+    def measure(self):
+        seen = set()
+        self.size = estimate_size(self.graph, seen)
+        for name, view in self.views.items():
+            if isinstance(view, GraphArrays) or name not in self.view_sizes:
+                self.view_sizes[name] = estimate_size(view, seen)
+            self.size += self.view_sizes[name]
+        return self.size
+
+# Figure part in the memory store, like edge segments, hover data, a level of detail, a level scene or a diff.
+# Objects can grow after they are stored, like a level scene adding selections, so they are measured again on every
+# access while arrays and containers of them keep the size they had when they were built.
+class FigurePartEntry:
+    def __init__(self, value, seen):
+        self.value = value
+        self.grows = hasattr(value, "__dict__")
+        self.size = estimate_size(value, seen)
+
+    def measure(self, seen):
+        if self.grows:
+            self.size = estimate_size(self.value, seen)
+        return self.size
+
+# In-memory store of parsed graphs keyed by the SHA-256 of the uploaded bytes, shared by every session of the
+# web app. Entries hold their derived views too, and the figure parts built from the graphs are kept in the same
+# budget. Once the store holds more than max_size bytes the least recently used figure parts are evicted first,
+# since they are rebuilt from the stored graphs, and then the least recently used graphs.
+class GraphMemoryStore:
+    def __init__(self, max_size=DEFAULT_MEMORY_BUDGET):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.parts = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.touch(key, entry)
+            return entry.graph
+
+    def put(self, key, graph):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key).size
+            entry = self.entries[key] = GraphStoreEntry(graph)
+            self.size += entry.size
+            self.evict()
+        return graph
+
+    # Marks an entry as most recently used and measures it again, evicting others if its graphs grew
+    def touch(self, key, entry):
+        self.entries.move_to_end(key)
+        self.size -= entry.size
+        self.size += entry.measure()
+        self.evict()
+
+    # Graphs of all the buffers, only the ones the store doesn't hold are parsed, all of them in one call to parse
+    # so they can be parsed concurrently. Graphs that failed to parse are None and aren't stored.
+    def get_or_parse_many(self, binary_datas, parse, keys=None):
+        keys = keys or [GraphCache.content_key(binary_data) for binary_data in binary_datas]
+        graphs = [self.get(key) for key in keys]
+        missing = [index for index, graph in enumerate(graphs) if graph is None]
+        if missing:
+            for index, graph in zip(missing, parse([binary_datas[index] for index in missing])):
+                if graph is not None:
+                    graphs[index] = self.put(keys[index], graph)
+        return graphs
+
+    # View of a stored graph built once and kept with its entry, a graph that was evicted gets its view rebuilt
+    # without keeping it
+    def get_view(self, key, name, build):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and name in entry.views:
+                self.touch(key, entry)
+                return entry.views[name]
+        value = build()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and name not in entry.views:
+                entry.views[name] = value
+                self.touch(key, entry)
+        return value
+
+    # Figure part by graph content and settings, built once and kept within the budget like TraceCache.get_or_build.
+    # Stored graphs and views the part refers to are already counted and don't add to its size.
+    def get_or_build(self, key, build):
+        with self.lock:
+            part = self.parts.get(key)
+            if part is not None:
+                self.parts.move_to_end(key)
+                self.hits += 1
+                if part.grows:
+                    self.size -= part.size
+                    self.size += part.measure(self.stored_ids())
+                    self.evict()
+                return part.value
+            self.misses += 1
+        value = build()
+        with self.lock:
+            if key not in self.parts:
+                part = self.parts[key] = FigurePartEntry(value, self.stored_ids())
+                self.size += part.size
+                self.evict()
+        return value
+
+    # Ids of the stored graphs and views, a figure part that refers to them doesn't count them again
+    def stored_ids(self):
+        return {id(graph) for entry in self.entries.values() for graph in (entry.graph, *entry.views.values())}
+
+    # Drops least recently used figure parts and then entries until the store fits its budget, the newest part and
+    # the newest entry are always kept
+    def evict(self):
+        while self.size > self.max_size and len(self.parts) > 1:
+            key, part = self.parts.popitem(last=False)
+            self.size -= part.size
+            logging.info(f"Evicted figure part {key[0]} from the memory store, {part.size / 1e6:.1f} MB")
+        while self.size > self.max_size and len(self.entries) > 1:
+            key, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            logging.info(f"Evicted graph {key[:12]} from the memory store, {len(entry.views)} views, {entry.size / 1e6:.1f} MB")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.parts.clear()
+            self.size = 0
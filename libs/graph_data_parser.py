@@ -1,111 +1,625 @@
+import hashlib
+import io
 import logging
+import mmap
+import multiprocessing
+import os
+import re
 import struct
+import sys
 import json
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from graph_const import material_mapping
+from libs.graph_profiler import GraphProfiler, profiler
+from libs.graph_spatial import GraphSpatialIndex
+
+# Bump when decoding changes in a way the record layout and dtypes don't show, cached parse results are dropped
+PARSER_VERSION = 2
+
+# Every record is a 4-byte tag followed by a 4-byte header and then the payload
+RECORD_HEADER_SIZE = 8
 
 class GraphData:
-    def __init__(self, name, hex_bytes, data_type, size):
+    # struct formats used to decode the payload of each data type
+    FORMATS = {
+        ("Integer", 1): "<B",
+        ("Integer", 2): "<H",
+        ("Integer", 4): "<I",
+        ("Single", 4): "<f",
+        ("Real64x3", 24): "<3d",
+        ("Stringx18", 20): "<20s",
+    }
+    # NumPy dtypes the raw payloads of a column are read as, positions are three doubles per row
+    DTYPES = {
+        ("Integer", 1): "u1",
+        ("Integer", 2): "<u2",
+        ("Integer", 4): "<u4",
+        ("Single", 4): "<f4",
+        ("Real64x3", 24): "<f8",
+        ("Stringx18", 20): "S20",
+    }
+
+    def __init__(self, name, hex_bytes, data_type, size, record_type):
         self.name = name
         self.hex_bytes = hex_bytes.replace(" ", "").lower()
         self.data_type = data_type
         self.size = size
-        self.data = []
-        
-    def clear_data(self):
-        self.data = []
-
-    def extract_data(self, binary_data, start_index):
-        index = binary_data.find(bytes.fromhex(self.hex_bytes), start_index)  # Search for the full 4-byte hex signature
-        if index == -1:
-            #logging.info(f"Hex signature {self.hex_bytes} not found after index {start_index}.")
-            return start_index  # If not found, return the same index
-        data_start_index = index + 8  # Adjusting for the 4 bytes offset
-        end_index = data_start_index + self.size
-
-        raw_data = binary_data[data_start_index:end_index]
+        self.record_type = record_type
+        self.tag = bytes.fromhex(self.hex_bytes)
+        self.unpacker = struct.Struct(GraphData.FORMATS[(data_type, size)])
+        self.dtype = np.dtype(GraphData.DTYPES[(data_type, size)])
+        self.empty_row = bytes(size)  # Zero bytes read as 0, 0.0, the origin and the empty string
+
+    def decode(self, binary_data, data_start_index):
+        values = self.unpacker.unpack_from(binary_data, data_start_index)
         if self.data_type == "Stringx18":
-            cleaned_data = ''.join([char if 32 <= ord(char) < 127 else '' for char in raw_data.decode(errors='ignore')]).strip()
-            self.data.append(cleaned_data)
+            return clean_string(values[0])
         elif self.data_type == "Real64x3":
-            x, y, z = struct.unpack('ddd', raw_data)
-            self.data.append((round(x, 2), round(y, 2), round(z,2)))
-        else:
-            self.data.append(raw_data)
-        
-        logging.info(f"Extracted data for {self.name} at index {index}. Data: {self.data[-1]}")
-        return end_index
+            x, y, z = values
+            return (round(x, 2), round(y, 2), round(z, 2))
+        return values[0]
+
+    # Column array of the raw payloads of every row, positions are rounded like decode() rounds them and
+    # strings are left as raw bytes for the caller to clean once per distinct value
+    def values(self, raw_column):
+        values = np.frombuffer(raw_column, dtype=self.dtype)
+        if self.data_type == "Real64x3":
+            return np.round(values.reshape(-1, 3), 2)
+        return values
 
 # graph file structure
 graphDatList = [
-    GraphData("Max Nodes", "04 E6 3A 0D", "Integer", 4),
-    GraphData("Node Id", "04 CE 35 07", "Integer", 4),
-    GraphData("Node Position", "04 95 42 1D", "Real64x3", 24),
-    GraphData("Node Gamma", "04 9C 7E 0F", "Single", 4),
-    GraphData("Node Radius", "04 23 30 14", "Single", 4),
-    GraphData("Node Material", "04 29 B6 1B", "Integer", 1),
-    GraphData("Node Criteria", "04 E5 D3 1B", "Stringx18", 20),
-    GraphData("Graph Edge1", "04 4A 10 09", "Integer", 2),
-    GraphData("Graph Edge2", "04 F6 18 09", "Integer", 2),
-    GraphData("Graph EdgeType", "04 23 A9 0D", "Integer", 1)
+    GraphData("Max Nodes", "04 E6 3A 0D", "Integer", 4, "graph"),
+    GraphData("Node Id", "04 CE 35 07", "Integer", 4, "node"),
+    GraphData("Node Position", "04 95 42 1D", "Real64x3", 24, "node"),
+    GraphData("Node Gamma", "04 9C 7E 0F", "Single", 4, "node"),
+    GraphData("Node Radius", "04 23 30 14", "Single", 4, "node"),
+    GraphData("Node Material", "04 29 B6 1B", "Integer", 1, "node"),
+    GraphData("Node Criteria", "04 E5 D3 1B", "Stringx18", 20, "node"),
+    GraphData("Graph Edge1", "04 4A 10 09", "Integer", 2, "edge"),
+    GraphData("Graph Edge2", "04 F6 18 09", "Integer", 2, "edge"),
+    GraphData("Graph EdgeType", "04 23 A9 0D", "Integer", 1, "edge")
 ]
 
-def convert_to_json(graphDataList):
-    nodes = []
-    edges = list(zip(graphDataList[7].data, graphDataList[8].data, graphDataList[9].data))  # Combine edge1, edge2, and type
+# Records that open a new node or edge, all other records of the same type fill it
+NODE_START_TAG = graphDatList[1].tag
+EDGE_START_TAG = graphDatList[7].tag
+NODE_START_NAME = graphDatList[1].name
+EDGE_START_NAME = graphDatList[7].name
 
-    node_counter = 1  # Counter for node IDs
+_NON_PRINTABLE_BYTES = bytes(b for b in range(256) if not 32 <= b < 127)
 
-    for i in range(len(graphDataList[1].data)):
-        # Use the node_counter for the node ID
-        node_id = node_counter
-        node_counter += 1
-        
-        # Filter edges that are directly connected to the current node
-        connected_edges = []
-        for edge in edges:
-            edge_id_1 = int.from_bytes(edge[0], "little", signed=False)
-            edge_id_2 = int.from_bytes(edge[1], "little", signed=False)
-            if node_id == edge_id_1:
-                connected_edges.append(edge_id_2)
-            elif node_id == edge_id_2:
-                connected_edges.append(edge_id_1)
-        
-        material_id = int(graphDataList[5].data[i].hex(), 16)
-        material_name = material_mapping.get(material_id, "UNKNOWN")
-        
-        node_criteria_prefix = "NODECRITERIA_"
-        node_criteria_index = graphDataList[6].data[i].lower().find(node_criteria_prefix.lower())
-        if node_criteria_index != -1:
-            node_criteria = graphDataList[6].data[i][node_criteria_index + len(node_criteria_prefix):]
-        else:
-            node_criteria = ""
-        node = {
-            "id": node_id,
-            "x": graphDataList[2].data[i][0],
-            "y": graphDataList[2].data[i][1],
-            "z": graphDataList[2].data[i][2],
-            "gamma": struct.unpack('f', graphDataList[3].data[i])[0],
-            "radius": struct.unpack('f', graphDataList[4].data[i])[0],
-            "material": material_name,
-            "criteria": node_criteria,
-            "edges": connected_edges
-        }
-        nodes.append(node)
-    return json.dumps(nodes, indent=4)
-
-def select_file(filename):
-    binary_data = read_binary_file(filename)
-    
-    # Clear existing data
-    for graphDat in graphDatList:
-        graphDat.clear_data()
-        
-    if binary_data:
-        extract_node_data(binary_data, graphDatList)
-        extract_edge_data(binary_data, graphDatList)
-        json_data = convert_to_json(graphDatList)
+def clean_string(raw_data):
+    return raw_data.translate(None, _NON_PRINTABLE_BYTES).decode("ascii").strip()
+
+# Raw payload bytes of every field in one growing buffer per column. Rows are fixed size, so a record is copied
+# straight into its slot of the last row and the columns are only turned into arrays at the end, which keeps
+# memory near the size of the decoded columns. Rows can be taken off the front while streaming.
+class GraphColumns:
+    def __init__(self, layout=graphDatList):
+        self.layout = layout
+        self.columns = {graphDat.name: bytearray() for graphDat in layout}
+        self.node_fields = [graphDat for graphDat in layout if graphDat.record_type == "node"]
+        self.edge_fields = [graphDat for graphDat in layout if graphDat.record_type == "edge"]
+        self.fields = {graphDat.name: graphDat for graphDat in layout}
+        self.nodes_started = False
+        self.edges_started = False
+
+    def rows(self, name):
+        return len(self.columns[name]) // self.fields[name].size
+
+    def first(self, name):
+        return self.fields[name].decode(self.columns[name], 0)
+
+    def node_rows(self):
+        return self.rows(NODE_START_NAME)
+
+    def edge_rows(self):
+        return self.rows(EDGE_START_NAME)
+
+    # Column arrays of every row scanned so far
+    def arrays(self):
+        return {graphDat.name: graphDat.values(self.columns[graphDat.name]) for graphDat in self.layout}
+
+    # Column arrays of the first rows, which are removed from the buffers
+    def take(self, node_rows, edge_rows):
+        taken = {}
+        for graphDat in self.layout:
+            column = self.columns[graphDat.name]
+            rows = node_rows if graphDat.record_type == "node" else edge_rows if graphDat.record_type == "edge" else self.rows(graphDat.name)
+            taken[graphDat.name] = graphDat.values(bytes(column[:rows * graphDat.size]))
+            del column[:rows * graphDat.size]
+        return taken
+
+class GraphScanner:
+    def __init__(self, layout=graphDatList, log_records=False):
+        self.layout = layout
+        self.log_records = log_records  # Log every decoded record, only meant for debugging the file layout
+        self.records = {graphDat.tag: graphDat for graphDat in layout}
+        self.pattern = re.compile(b"|".join(re.escape(tag) for tag in self.records))
+        self.tag_size = max(len(tag) for tag in self.records)
+
+    # Walk the buffer once and decode every tagged record into columns keyed by field name
+    def scan(self, binary_data):
+        graph_columns = GraphColumns(self.layout)
+        with profiler.stage("scan", bytes=len(binary_data)) as timer:
+            self.scan_into(graph_columns, binary_data)
+            timer.records = graph_columns.node_rows() + graph_columns.edge_rows()
+        logging.info(f"Scanned {graph_columns.node_rows()} nodes and {graph_columns.edge_rows()} edges from {len(binary_data)} bytes.")
+        return graph_columns.arrays()
+
+    # Decode the records of binary_data into graph_columns and return the index scanning should resume from,
+    # unless final the buffer may end inside a record which is then left for the next call
+    def scan_into(self, graph_columns, binary_data, position=0, final=True):
+        columns = graph_columns.columns
+        node_fields = graph_columns.node_fields
+        edge_fields = graph_columns.edge_fields
+        nodes_started = graph_columns.nodes_started
+        edges_started = graph_columns.edges_started
+        log_records = self.log_records
+        search = self.pattern.search
+        records = self.records
+        data_size = len(binary_data)
+
+        while True:
+            match = search(binary_data, position)
+            if match is None:
+                # A tag may be split across the end of the buffer
+                position = max(position, data_size - self.tag_size + 1)
+                break
+            index = match.start()
+            graphDat = records[match.group()]
+            data_start_index = index + RECORD_HEADER_SIZE
+            end_index = data_start_index + graphDat.size
+            if end_index > data_size:
+                if final:
+                    logging.warning(f"Truncated {graphDat.name} record at index {index}.")
+                position = index
+                break
+
+            if graphDat.tag == NODE_START_TAG:
+                for field in node_fields:
+                    columns[field.name] += field.empty_row
+                nodes_started = True
+            elif graphDat.tag == EDGE_START_TAG:
+                for field in edge_fields:
+                    columns[field.name] += field.empty_row
+                edges_started = True
+
+            column = columns[graphDat.name]
+            if graphDat.record_type == "graph":
+                column += binary_data[data_start_index:end_index]
+            elif (graphDat.record_type == "node" and nodes_started) or (graphDat.record_type == "edge" and edges_started):
+                column[-graphDat.size:] = binary_data[data_start_index:end_index]
+            if log_records and column:
+                logging.debug(f"Extracted data for {graphDat.name} at index {index}. Data: {graphDat.decode(column, len(column) - graphDat.size)}")
+            position = end_index
+
+        graph_columns.nodes_started = nodes_started
+        graph_columns.edges_started = edges_started
+        return position
+
+graph_scanner = GraphScanner(log_records=os.environ.get("IGI_GRAPH_LOG_RECORDS", "") not in ("", "0"))
+
+# Structured layouts of the parsed graph, one row per node and one row per edge
+NODE_DTYPE = np.dtype([
+    ("id", "<i4"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("z", "<f8"),
+    ("gamma", "<f4"),
+    ("radius", "<f4"),
+    ("material", "u1"),
+    ("criteria", "U20"),
+])
+EDGE_DTYPE = np.dtype([
+    ("source", "<i4"),
+    ("target", "<i4"),
+    ("type", "u1"),
+])
+
+NODE_CRITERIA_PREFIX = "NODECRITERIA_"
+
+# Name of every material code, codes without a name are UNKNOWN
+MATERIAL_NAMES = np.array([material_mapping.get(code, "UNKNOWN") for code in range(256)])
+
+# Compressed sparse row adjacency, neighbours of row i are neighbours[offsets[i]:offsets[i + 1]]
+# Bytes of a list of count items, without the items themselves
+def list_nbytes(count):
+    return sys.getsizeof([]) + count * np.dtype(np.intp).itemsize
+
+class GraphAdjacency:
+    def __init__(self, offsets, neighbours, edge_rows):
+        self.offsets = offsets
+        self.neighbours = neighbours  # Neighbour node ids as stored in the edge records
+        self.edge_rows = edge_rows  # Row in the edge array each neighbour entry came from
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def degrees(self):
+        return np.diff(self.offsets)
+
+    def neighbours_of(self, row):
+        return self.neighbours[self.offsets[row]:self.offsets[row + 1]]
+
+    def to_lists(self):
+        neighbours = self.neighbours.tolist()
+        bounds = self.offsets.tolist()
+        return [neighbours[bounds[row]:bounds[row + 1]] for row in range(len(bounds) - 1)]
+
+    # Bytes of to_lists() counted from the lengths: the outer list, one list per node and one int per neighbour
+    def lists_nbytes(self):
+        count = len(self.neighbours)
+        return list_nbytes(len(self)) + len(self) * list_nbytes(0) + count * (np.dtype(np.intp).itemsize + sys.getsizeof(0))
+
+    @staticmethod
+    def concatenate(adjacencies, edge_counts):
+        offsets = [np.zeros(1, dtype=np.int64)]
+        neighbours = []
+        edge_rows = []
+        entry_base = 0
+        edge_base = 0
+        for adjacency, edge_count in zip(adjacencies, edge_counts):
+            offsets.append(adjacency.offsets[1:] + entry_base)
+            neighbours.append(adjacency.neighbours)
+            edge_rows.append(adjacency.edge_rows + edge_base)
+            entry_base += len(adjacency.neighbours)
+            edge_base += edge_count
+        return GraphAdjacency(np.concatenate(offsets),
+                              np.concatenate(neighbours) if neighbours else np.empty(0, dtype=np.int32),
+                              np.concatenate(edge_rows) if edge_rows else np.empty(0, dtype=np.int64))
+
+# Parsed graph result, the arrays are read-only so one result can be shared between threads
+class GraphArrays:
+    def __init__(self, nodes, edges, adjacency, max_nodes=None):
+        self.nodes = nodes
+        self.edges = edges
+        self.adjacency = adjacency
+        self.max_nodes = max_nodes
+        self._links = None
+        self._spatial_index = None
+        self._derived_parts = {}
+        self._content_key = None
+        for array in (nodes, edges, adjacency.offsets, adjacency.neighbours, adjacency.edge_rows):
+            array.flags.writeable = False
+
+    def __reduce__(self):
+        return (GraphArrays, (self.nodes, self.edges, self.adjacency, self.max_nodes))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    # Per node lists of linked node ids, derived from the adjacency index on first use
+    @property
+    def links(self):
+        if self._links is None:
+            self._links = self.adjacency.to_lists()
+        return self._links
+
+    # Hash of the node and edge arrays, equal graphs get the same key so results derived from them can be cached
+    @property
+    def content_key(self):
+        if self._content_key is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(np.ascontiguousarray(self.nodes).data)
+            digest.update(np.ascontiguousarray(self.edges).data)
+            self._content_key = digest.hexdigest()
+        return self._content_key
+
+    # Grid index over the node positions for nearest, radius and box queries, built on first use
+    @property
+    def spatial_index(self):
+        if self._spatial_index is None:
+            self._spatial_index = GraphSpatialIndex.from_nodes(self.nodes)
+        return self._spatial_index
+
+    # Part another module derives from the graph, like the router of graph_paths, built by build(graph) on first use
+    # and kept with the graph. Callers that build parts from several threads hold their own lock.
+    def derived_part(self, name, build):
+        part = self._derived_parts.get(name)
+        if part is None:
+            part = self._derived_parts[name] = build(self)
+        return part
+
+    # Bytes of the parts built from the arrays so far: the links, the spatial index and the derived parts, which
+    # report their own size from their lengths so nothing is walked item by item
+    def lazy_parts_nbytes(self):
+        size = self.adjacency.lists_nbytes() if self._links is not None else 0
+        if self._spatial_index is not None:
+            size += self._spatial_index.nbytes()
+        return size + sum(part.nbytes() for part in self._derived_parts.values())
+
+    def material_names(self):
+        return MATERIAL_NAMES[self.nodes["material"]].tolist()
+
+    def with_flat_height(self):
+        nodes = self.nodes.copy()
+        nodes["z"] = 0  # Set Z position to 0 or any other default value
+        return GraphArrays(nodes, self.edges, self.adjacency, self.max_nodes)
+
+    # Same graph with offset added to every node id, the edges and the adjacency are remapped with it
+    def with_id_offset(self, offset):
+        nodes = self.nodes.copy()
+        nodes["id"] += offset
+        edges = self.edges.copy()
+        edges["source"] += offset
+        edges["target"] += offset
+        adjacency = self.adjacency
+        return GraphArrays(nodes, edges, GraphAdjacency(adjacency.offsets, adjacency.neighbours + offset, adjacency.edge_rows), self.max_nodes)
+
+    def to_records(self):
+        nodes = self.nodes
+        records = []
+        for node_id, x, y, z, gamma, radius, material, criteria, links in zip(
+                nodes["id"].tolist(), nodes["x"].tolist(), nodes["y"].tolist(), nodes["z"].tolist(),
+                nodes["gamma"].tolist(), nodes["radius"].tolist(), self.material_names(),
+                nodes["criteria"].tolist(), self.links):
+            records.append({
+                "id": node_id,
+                "x": x,
+                "y": y,
+                "z": z,
+                "gamma": gamma,
+                "radius": radius,
+                "material": material,
+                "criteria": criteria,
+                "edges": list(links)
+            })
+        return records
+
+    def to_json(self):
+        with profiler.stage("serialization", records=len(self.nodes)):
+            return json.dumps(self.to_records(), indent=4)
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.to_records(), columns=list(NODE_DTYPE.names) + ["edges"])
+
+    @staticmethod
+    def concatenate(graphs):
+        graphs = list(graphs)
+        nodes = np.concatenate([graph.nodes for graph in graphs]) if graphs else np.empty(0, dtype=NODE_DTYPE)
+        edges = np.concatenate([graph.edges for graph in graphs]) if graphs else np.empty(0, dtype=EDGE_DTYPE)
+        adjacency = GraphAdjacency.concatenate([graph.adjacency for graph in graphs], [len(graph.edges) for graph in graphs])
+        return GraphArrays(nodes, edges, adjacency)
+
+def strip_criteria_prefix(criteria):
+    node_criteria_index = criteria.lower().find(NODE_CRITERIA_PREFIX.lower())
+    if node_criteria_index != -1:
+        return criteria[node_criteria_index + len(NODE_CRITERIA_PREFIX):]
+    return ""
+
+# Map node ids to their row in node_ids, -1 where the id does not exist (first row wins on duplicates)
+def lookup_node_rows(node_ids, ids):
+    ids = np.asarray(ids)
+    if len(node_ids) == 0:
+        return np.full(ids.shape, -1, dtype=np.int64)
+    order = np.argsort(node_ids, kind="stable")
+    sorted_ids = node_ids[order]
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, order[positions], -1)
+
+# Edges that link two different existing nodes, given the node rows of their ends
+def linking_edges(source_rows, target_rows):
+    return (source_rows >= 0) & (target_rows >= 0) & (source_rows != target_rows)
+
+# Each undirected link between two different existing nodes once, as node rows with the lower row first.
+# Both the drawn links and the connectivity report use this, so they always count the same links.
+def unique_link_rows(source_rows, target_rows, node_count):
+    valid = linking_edges(source_rows, target_rows)
+    low_rows = np.minimum(source_rows[valid], target_rows[valid])
+    high_rows = np.maximum(source_rows[valid], target_rows[valid])
+    keys = np.unique(low_rows * max(node_count, 1) + high_rows)
+    return keys // max(node_count, 1), keys % max(node_count, 1)
+
+def build_adjacency(node_ids, edges):
+    with profiler.stage("adjacency", records=len(edges)):
+        return _build_adjacency(node_ids, edges)
+
+def _build_adjacency(node_ids, edges):
+    node_count = len(node_ids)
+    source = edges["source"]
+    target = edges["target"]
+
+    # Every edge links both of its endpoints, self links are only listed once
+    owners = np.column_stack((source, target)).ravel()
+    neighbours = np.column_stack((target, source)).ravel()
+    edge_rows = np.repeat(np.arange(len(edges), dtype=np.int64), 2)
+    owner_rows = lookup_node_rows(node_ids, owners)
+    keep = owner_rows >= 0
+    keep[1::2] &= source != target
+    owner_rows = owner_rows[keep]
+
+    # Stable sort keeps each node's links in edge record order
+    order = np.argsort(owner_rows, kind="stable")
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner_rows, minlength=node_count), out=offsets[1:])
+    return GraphAdjacency(offsets, neighbours[keep][order], edge_rows[keep][order])
+
+def build_node_array(columns, first_id=1):
+    with profiler.stage("node decode", records=len(columns["Node Id"])):
+        return _build_node_array(columns, first_id)
+
+def _build_node_array(columns, first_id):
+    node_count = len(columns["Node Id"])
+    nodes = np.zeros(node_count, dtype=NODE_DTYPE)
+    nodes["id"] = np.arange(first_id, first_id + node_count)  # Node IDs are the 1-based record order
+    positions = columns["Node Position"]
+    nodes["x"] = positions[:, 0]
+    nodes["y"] = positions[:, 1]
+    nodes["z"] = positions[:, 2]
+    nodes["gamma"] = columns["Node Gamma"]
+    nodes["radius"] = columns["Node Radius"]
+    nodes["material"] = columns["Node Material"]
+    # Nodes share a few criteria, every distinct raw value is cleaned once
+    criteria, inverse = np.unique(columns["Node Criteria"], return_inverse=True)
+    cleaned = np.array([strip_criteria_prefix(clean_string(value)) for value in criteria], dtype=NODE_DTYPE["criteria"])
+    np.take(cleaned, inverse, out=nodes["criteria"])
+    return nodes
+
+def build_edge_array(columns):
+    with profiler.stage("edge decode", records=len(columns["Graph Edge1"])):
+        return _build_edge_array(columns)
+
+def _build_edge_array(columns):
+    edges = np.zeros(len(columns["Graph Edge1"]), dtype=EDGE_DTYPE)
+    edges["source"] = columns["Graph Edge1"]
+    edges["target"] = columns["Graph Edge2"]
+    edges["type"] = columns["Graph EdgeType"]
+    return edges
+
+# Graph of scanned columns, the columns are emptied once decoded so the raw bytes are freed before the adjacency
+def build_graph_arrays(columns):
+    nodes = build_node_array(columns)
+    edges = build_edge_array(columns)
+    max_nodes = int(columns["Max Nodes"][0]) if len(columns["Max Nodes"]) else None
+    columns.clear()
+    return GraphArrays(nodes, edges, build_adjacency(nodes["id"], edges), max_nodes)
+
+# A slice of decoded nodes and edges from iter_graph_chunks, bytes_read is the input consumed so far
+class GraphChunk:
+    def __init__(self, nodes, edges, bytes_read, max_nodes=None):
+        self.nodes = nodes
+        self.edges = edges
+        self.bytes_read = bytes_read
+        self.max_nodes = max_nodes
+
+# Decode a graph file object, memory map, upload buffer, bytes or path incrementally and yield at most chunk_size
+# nodes and chunk_size edges at a time, so memory stays bounded by the chunk and block size instead of the file
+def iter_graph_chunks(source, chunk_size=10000, block_size=1 << 20, scanner=graph_scanner):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            yield from iter_graph_chunks(file, chunk_size, block_size, scanner)
+        return
+
+    graph_columns = GraphColumns(scanner.layout)
+    buffer = b""
+    bytes_read = 0
+    next_node_id = 1
+    max_nodes = None
+    final = False
+    while not final:
+        block = source.read(block_size)
+        final = not block
+        bytes_read += len(block)
+        buffer += block
+        position = scanner.scan_into(graph_columns, buffer, 0, final)
+        buffer = buffer[position:]
+        if max_nodes is None and graph_columns.rows("Max Nodes"):
+            max_nodes = graph_columns.first("Max Nodes")
+
+        # The last node or edge may still get fields from the next block
+        node_rows = graph_columns.node_rows() - (0 if final else 1)
+        edge_rows = graph_columns.edge_rows() - (0 if final else 1)
+        while node_rows >= chunk_size or edge_rows >= chunk_size or (final and (node_rows > 0 or edge_rows > 0)):
+            taken_nodes = min(max(node_rows, 0), chunk_size)
+            taken_edges = min(max(edge_rows, 0), chunk_size)
+            columns = graph_columns.take(taken_nodes, taken_edges)
+            yield GraphChunk(build_node_array(columns, next_node_id), build_edge_array(columns), bytes_read, max_nodes)
+            next_node_id += taken_nodes
+            node_rows -= taken_nodes
+            edge_rows -= taken_edges
+
+# Assemble streamed chunks back into a complete GraphArrays result
+def collect_graph_chunks(chunks):
+    chunks = list(chunks)
+    nodes = np.concatenate([chunk.nodes for chunk in chunks]) if chunks else np.empty(0, dtype=NODE_DTYPE)
+    edges = np.concatenate([chunk.edges for chunk in chunks]) if chunks else np.empty(0, dtype=EDGE_DTYPE)
+    max_nodes = chunks[-1].max_nodes if chunks else None
+    del chunks  # Free the chunk arrays before the adjacency is built
+    return GraphArrays(nodes, edges, build_adjacency(nodes["id"], edges), max_nodes)
+
+def convert_to_json(graph):
+    return graph.to_json()
+
+def parse_graph_buffer(binary_data, scanner=graph_scanner, cache=None):
+    if not binary_data:
+        return None
+    if cache is not None:
+        return cache.get_or_parse(binary_data, partial(parse_graph_buffer, binary_data, scanner))
+    return build_graph_arrays(scanner.scan(binary_data))
+
+# Parse a graph from raw bytes or from a file path, all parse state is local to the call
+def parse_graph(source, use_mmap=True, cache=None):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return parse_graph_buffer(source, cache=cache)
+    with open_binary_file(source, use_mmap) as binary_data:
+        return parse_graph_buffer(binary_data, cache=cache)
+
+# Parse many graphs at once, results keep the order of sources and failed sources give None. Sources are parsed on
+# the workers of executor when one is given, so a long-lived process pool can be reused between calls, or on a pool
+# started for this call with use_processes. Otherwise they are parsed in this process one after another, the scanner
+# is pure Python and holds the GIL, so threads would only add overhead.
+def parse_graphs(sources, max_workers=None, use_processes=False, cache=None, executor=None):
+    sources = list(sources)
+    if len(sources) <= 1 or (executor is None and not use_processes):
+        return [parse_graph_or_none(source, cache) for source in sources]
+    if executor is None:
+        with create_parse_pool(max_workers) as executor:
+            return parse_on_workers(executor, sources, cache)
+    return parse_on_workers(executor, sources, cache)
+
+# Worker processes have their own profiler, their timings are sent back with the result when the caller records
+def parse_on_workers(executor, sources, cache=None):
+    active_profiler = profiler.active
+    if not active_profiler.enabled:
+        return list(executor.map(partial(parse_graph_or_none, cache=cache), sources))
+    results = list(executor.map(partial(parse_graph_profiled, cache=cache), sources))
+    for _, snapshot in results:
+        active_profiler.merge(snapshot)
+    return [graph for graph, _ in results]
+
+# Process pool for parse_graphs, workers are started by a fork server or spawned and never forked from the caller,
+# which may be a multithreaded server
+def create_parse_pool(max_workers=None):
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(start_method))
+
+def parse_graph_profiled(source, cache=None):
+    with profiler.recording_into(GraphProfiler(enabled=True)) as run_profiler:
+        graph = parse_graph_or_none(source, cache)
+    return graph, run_profiler.snapshot()
+
+def parse_graph_or_none(source, cache=None):
+    try:
+        return parse_graph(source, cache=cache)
+    except Exception as e:
+        name = source if isinstance(source, (str, os.PathLike)) else "buffer"
+        logging.error(f"Error parsing graph {name}: {e}")
+        return None
+
+def select_file(filename, use_mmap=True, cache=None):
+    graph = None
+    try:
+        graph = parse_graph(filename, use_mmap, cache)
+    except OSError as e:
+        logging.error(f"Error reading file {filename}: {e}")
         
-    return json_data
+    return graph
+
+# Yield the file contents as a read-only memory map so the scanner decodes straight from the page cache,
+# falls back to a plain read for empty files or when use_mmap is False
+@contextmanager
+def open_binary_file(filename, use_mmap=True):
+    with open(filename, "rb") as file:
+        file_size = os.fstat(file.fileno()).st_size
+        if not use_mmap or file_size == 0:
+            with profiler.stage("read", records=1, bytes=file_size):
+                binary_data = file.read()
+            yield binary_data
+            return
+        with profiler.stage("read", records=1, bytes=file_size):
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+        with mapped:
+            yield mapped
 
 def read_binary_file(filename):
     try:
@@ -115,51 +629,12 @@ def read_binary_file(filename):
         logging.error(f"Error reading file {filename}: {e}")
         return None
 
-def extract_node_data(binary_data, graphDatList):
-    logging.info("Extracting node data...")
-    start_index = 0
-    while start_index < len(binary_data):
-        logging.info(f"Searching for node data at index {start_index}...")
-        node_id_index = binary_data.find(bytes.fromhex("04 CE 35 07"), start_index)
-        
-        if node_id_index == -1:
-            logging.info("No more node data found.")
-            break
-        
-        next_node_id_index = binary_data.find(bytes.fromhex("04 CE 35 07"), node_id_index + 4)
-        if next_node_id_index == -1:
-            next_node_id_index = len(binary_data)
-        
-        for graphDat in graphDatList:
-            if "Edge" not in graphDat.name:  # Skip edge properties for node extraction
-                prop_index = graphDat.extract_data(binary_data, node_id_index)
-                if prop_index >= next_node_id_index:
-                    break
-        
-        start_index = next_node_id_index
-
-
-
-def extract_edge_data(binary_data, graphDatList):
-    logging.info("Extracting edge data...")
-    start_index = 0
-    while start_index < len(binary_data):
-        logging.info(f"Searching for edge data at index {start_index}...")
-        edge_id_index = binary_data.find(bytes.fromhex("04 4A 10 09"), start_index)
-        
-        if edge_id_index == -1:
-            logging.info("No more edge data found.")
-            break
-        
-        for graphDat in graphDatList:
-            if "Edge" in graphDat.name:  # Only process edge properties for edge extraction
-                start_index = graphDat.extract_data(binary_data, edge_id_index)
-        
-def print_results(graphDatList):
+def print_results(columns):
     for graphDat in graphDatList:
+        column = columns[graphDat.name]
         if graphDat.data_type == "Stringx18":
-            logging.info(f"{graphDat.name}: {graphDat.data}")
+            logging.info(f"{graphDat.name}: {[clean_string(value) for value in column]}")
         elif graphDat.data_type == "Real64x3":
-            logging.info(f"{graphDat.name}: [{' '.join(map(str, pos))}]" for pos in graphDat.data)
+            logging.info(f"{graphDat.name}: [{' '.join(' '.join(map(str, pos)) for pos in column)}]")
         else:
-            logging.info(f"{graphDat.name}: [{' '.join(map(lambda x: x.hex().upper(), graphDat.data))}]")
+            logging.info(f"{graphDat.name}: [{' '.join(map(str, column))}]")
@@ -0,0 +1,92 @@
+import numpy as np
+from libs.graph_data_parser import EDGE_DTYPE, NODE_CRITERIA_PREFIX, NODE_DTYPE, RECORD_HEADER_SIZE, graphDatList
+
+# Edge records store node ids as 16-bit integers, so only the first 65535 nodes can be linked
+MAX_EDGE_NODE_ID = 0xFFFF
+
+NODE_CRITERIA_NAMES = ["NONE", "JUMP", "CROUCH", "LADDER", "DOOR", "WINDOW"]
+
+def graph_field(name):
+    return next(graphDat for graphDat in graphDatList if graphDat.name == name)
+
+# One packed block per record type, every record is its tag, the 4-byte header and the payload
+def record_block_dtype(record_type):
+    fields = []
+    for graphDat in graphDatList:
+        if graphDat.record_type != record_type:
+            continue
+        key = graphDat.name.lower().replace(" ", "_")
+        payload = {"Stringx18": f"S{graphDat.size}", "Real64x3": "<3f8", "Single": "<f4"}.get(graphDat.data_type, graphDat.unpacker.format)
+        fields += [(f"{key}_tag", "V4"), (f"{key}_header", "<u4"), (key, payload)]
+    dtype = np.dtype(fields)
+    assert dtype.itemsize == sum(graphDat.size + RECORD_HEADER_SIZE for graphDat in graphDatList if graphDat.record_type == record_type)
+    return dtype
+
+def fill_record_block(block, record_type):
+    for graphDat in graphDatList:
+        if graphDat.record_type == record_type:
+            key = graphDat.name.lower().replace(" ", "_")
+            block[f"{key}_tag"] = np.void(graphDat.tag)
+            block[f"{key}_header"] = graphDat.size  # The header is written as the payload size
+
+# Serialize node and edge arrays (NODE_DTYPE / EDGE_DTYPE) to the graph .dat record layout
+def build_graph_bytes(nodes, edges, max_nodes=None):
+    header = np.zeros(1, dtype=record_block_dtype("graph"))
+    fill_record_block(header, "graph")
+    header["max_nodes"] = len(nodes) if max_nodes is None else max_nodes
+
+    node_block = np.zeros(len(nodes), dtype=record_block_dtype("node"))
+    fill_record_block(node_block, "node")
+    node_block["node_id"] = nodes["id"]
+    node_block["node_position"] = np.column_stack((nodes["x"], nodes["y"], nodes["z"])) if len(nodes) else np.zeros((0, 3))
+    node_block["node_gamma"] = nodes["gamma"]
+    node_block["node_radius"] = nodes["radius"]
+    node_block["node_material"] = nodes["material"]
+    node_block["node_criteria"] = np.char.encode(np.char.add(NODE_CRITERIA_PREFIX, nodes["criteria"]), "ascii")
+
+    edge_block = np.zeros(len(edges), dtype=record_block_dtype("edge"))
+    fill_record_block(edge_block, "edge")
+    edge_block["graph_edge1"] = edges["source"]
+    edge_block["graph_edge2"] = edges["target"]
+    edge_block["graph_edgetype"] = edges["type"]
+
+    return header.tobytes() + node_block.tobytes() + edge_block.tobytes()
+
+def write_graph_file(filename, nodes, edges, max_nodes=None):
+    binary_data = build_graph_bytes(nodes, edges, max_nodes)
+    with open(filename, "wb") as file:
+        file.write(binary_data)
+    return len(binary_data)
+
+# Random but reproducible graph, nodes are spread over a level sized box and every node links back to
+# one of the nodes placed before it, plus extra_links random links per node
+def generate_graph(node_count, seed=0, extra_links=1.0, extent=100000.0):
+    rng = np.random.default_rng(seed)
+    nodes = np.zeros(node_count, dtype=NODE_DTYPE)
+    nodes["id"] = np.arange(1, node_count + 1)
+    nodes["x"] = np.round(rng.uniform(-extent, extent, node_count), 2)
+    nodes["y"] = np.round(rng.uniform(-extent, extent, node_count), 2)
+    nodes["z"] = np.round(rng.uniform(-extent / 100, extent / 100, node_count), 2)
+    nodes["gamma"] = rng.random(node_count, dtype=np.float32)
+    nodes["radius"] = rng.uniform(0.5, 2.0, node_count).astype(np.float32)
+    nodes["material"] = rng.integers(0, 24, node_count)
+    nodes["criteria"] = np.array(NODE_CRITERIA_NAMES)[rng.integers(0, len(NODE_CRITERIA_NAMES), node_count)]
+
+    linked_count = min(node_count, MAX_EDGE_NODE_ID)
+    if linked_count > 1:
+        targets = np.arange(2, linked_count + 1)
+        sources = (rng.random(linked_count - 1) * (targets - 1)).astype(np.int64) + 1
+        extra_count = int((linked_count - 1) * extra_links)
+        sources = np.concatenate([sources, rng.integers(1, linked_count + 1, extra_count)])
+        targets = np.concatenate([targets, rng.integers(1, linked_count + 1, extra_count)])
+    else:
+        sources = targets = np.empty(0, dtype=np.int64)
+    edges = np.zeros(len(sources), dtype=EDGE_DTYPE)
+    edges["source"] = sources
+    edges["target"] = targets
+    edges["type"] = rng.integers(0, 3, len(sources))
+    return nodes, edges
+
+def write_synthetic_graph(filename, node_count, seed=0, extra_links=1.0):
+    nodes, edges = generate_graph(node_count, seed, extra_links)
+    return write_graph_file(filename, nodes, edges)
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from libs.graph_data_parser import MATERIAL_NAMES
+from libs.graph_profiler import profiler
+
+# Nodes that moved less than this are not reported as moved
+DEFAULT_POSITION_TOLERANCE = 0.01
+
+# Node attributes compared between the two versions besides the position
+COMPARED_ATTRIBUTES = ["material", "criteria", "gamma", "radius"]
+
+# Node ids once in ascending order and the row of each, the first row wins on duplicate ids like lookup_node_rows
+def unique_id_rows(node_ids):
+    return np.unique(node_ids, return_index=True)
+
+# Every undirected link once as a sorted int64 key, the lower node id in the high 32 bits
+def link_keys(edges):
+    low = np.minimum(edges["source"], edges["target"]).astype(np.int64)
+    high = np.maximum(edges["source"], edges["target"]).astype(np.int64)
+    keys = np.sort((low << 32) | (high & 0xFFFFFFFF))
+    return keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+
+# Keys of sorted unique keys that are not in other sorted unique keys, found by binary search without a merge sort
+def sorted_difference(keys, other):
+    if not len(other):
+        return keys
+    positions = np.minimum(np.searchsorted(other, keys), len(other) - 1)
+    return keys[other[positions] != keys]
+
+# Node id pairs of link keys as an array of shape (links, 2)
+def split_link_keys(keys):
+    return np.column_stack(((keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.uint32).view(np.int32)))
+
+# Changes from one version of a graph to another. Nodes are matched by id, ids only in the new graph are added
+# and ids only in the old graph removed. Matched nodes are compared by position within the tolerance and by
+# the other attributes exactly, links are compared as sets of undirected node id pairs.
+class GraphDiff:
+    def __init__(self, old_graph, new_graph, tolerance=DEFAULT_POSITION_TOLERANCE):
+        self.old_graph = old_graph
+        self.new_graph = new_graph
+        self.tolerance = tolerance
+        old_ids, old_rows = unique_id_rows(old_graph.nodes["id"])
+        new_ids, new_rows = unique_id_rows(new_graph.nodes["id"])
+        self.added_ids = sorted_difference(new_ids, old_ids)
+        self.removed_ids = sorted_difference(old_ids, new_ids)
+
+        # Rows of the nodes in both versions, in ascending id order
+        common_ids, old_common, new_common = np.intersect1d(old_ids, new_ids, assume_unique=True, return_indices=True)
+        old_common = old_rows[old_common]
+        new_common = new_rows[new_common]
+        squared_distances = np.zeros(len(common_ids))
+        for axis in ("x", "y", "z"):
+            squared_distances += (new_graph.nodes[axis][new_common] - old_graph.nodes[axis][old_common]) ** 2
+        moved = squared_distances > tolerance * tolerance
+        self.moved_ids = common_ids[moved]
+        self.moved_distances = np.sqrt(squared_distances[moved])
+
+        # Ids with the old and new value of every attribute that changed, columns are gathered one at a time
+        # since copying whole node records is slower
+        self.attribute_changes = {}
+        for name in COMPARED_ATTRIBUTES:
+            old_values = old_graph.nodes[name][old_common]
+            new_values = new_graph.nodes[name][new_common]
+            changed = old_values != new_values
+            self.attribute_changes[name] = (common_ids[changed], old_values[changed], new_values[changed])
+
+        old_links = link_keys(old_graph.edges)
+        new_links = link_keys(new_graph.edges)
+        self.added_links = split_link_keys(sorted_difference(new_links, old_links))
+        self.removed_links = split_link_keys(sorted_difference(old_links, new_links))
+
+    # Ids of the nodes in both versions that moved or have another attribute value
+    @property
+    def changed_ids(self):
+        return np.unique(np.concatenate([self.moved_ids] + [ids for ids, _, _ in self.attribute_changes.values()]))
+
+    def __bool__(self):
+        return bool(len(self.added_ids) or len(self.removed_ids) or len(self.changed_ids) or len(self.added_links) or len(self.removed_links))
+
+    # Number of changes of every kind as one report row
+    def summary(self, graph_id=None):
+        summary = {} if graph_id is None else {"graph": graph_id}
+        summary.update({
+            "added nodes": len(self.added_ids),
+            "removed nodes": len(self.removed_ids),
+            "moved nodes": len(self.moved_ids),
+        })
+        for name, (ids, _, _) in self.attribute_changes.items():
+            summary[f"{name} changes"] = len(ids)
+        summary["added links"] = len(self.added_links)
+        summary["removed links"] = len(self.removed_links)
+        return summary
+
+    # One row per change with the node id or link and the old and new value
+    def to_dataframe(self, graph_id=None):
+        frames = [
+            change_frame("added node", self.added_ids),
+            change_frame("removed node", self.removed_ids),
+            change_frame("moved", self.moved_ids, new=self.moved_distances.round(3)),
+        ]
+        for name, (ids, old_values, new_values) in self.attribute_changes.items():
+            if name == "material":
+                old_values, new_values = MATERIAL_NAMES[old_values], MATERIAL_NAMES[new_values]
+            frames.append(change_frame(name, ids, old_values, new_values))
+        for change, links in (("added link", self.added_links), ("removed link", self.removed_links)):
+            frames.append(change_frame(change, links[:, 0], new=links[:, 1]))
+        result = pd.concat([frame for frame in frames if len(frame)] or frames[:1], ignore_index=True)
+        if graph_id is not None:
+            result.insert(0, "graph", graph_id)
+        return result
+
+# Old and new values are written as text since they hold numbers, names and node ids depending on the change
+def change_frame(change, ids, old=None, new=None):
+    return pd.DataFrame({
+        "change": change,
+        "id": ids,
+        "old": np.asarray(old).astype(str) if old is not None else np.full(len(ids), ""),
+        "new": np.asarray(new).astype(str) if new is not None else np.full(len(ids), ""),
+    })
+
+def diff_graphs(old_graph, new_graph, tolerance=DEFAULT_POSITION_TOLERANCE):
+    with profiler.stage("diff", records=len(old_graph.nodes) + len(new_graph.nodes)):
+        return GraphDiff(old_graph, new_graph, tolerance)
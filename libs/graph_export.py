@@ -0,0 +1,118 @@
+import json
+import os
+import numpy as np
+from graph_const import material_mapping
+from libs.graph_data_parser import GraphAdjacency, GraphArrays
+from libs.graph_profiler import profiler
+
+# Export formats by file extension
+EXPORT_FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".npz": "npz",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+EXPORT_BATCH_SIZE = 4096
+
+def export_format_for(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{extension}', use one of {', '.join(EXPORT_FORMATS)}")
+    return EXPORT_FORMATS[extension]
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet and Arrow export, install it with 'pip install pyarrow'")
+
+# Yield node records in batches, built from column slices so only one batch of Python objects exists at a time
+def iter_node_records(graph, batch_size=EXPORT_BATCH_SIZE):
+    nodes = graph.nodes
+    names = nodes.dtype.names
+    neighbours = graph.adjacency.neighbours
+    offsets = graph.adjacency.offsets
+    for start in range(0, len(nodes), batch_size):
+        end = min(start + batch_size, len(nodes))
+        columns = [nodes[name][start:end].tolist() for name in names]
+        if "material" in names:
+            material_index = names.index("material")
+            columns[material_index] = [material_mapping.get(code, "UNKNOWN") for code in columns[material_index]]
+        batch_neighbours = neighbours[offsets[start]:offsets[end]].tolist()
+        bounds = (offsets[start:end + 1] - offsets[start]).tolist()
+        for row, values in enumerate(zip(*columns)):
+            record = dict(zip(names, values))
+            record["edges"] = batch_neighbours[bounds[row]:bounds[row + 1]]
+            yield record
+
+# Same text as GraphArrays.to_json() but written record by record
+def write_json(file, graph):
+    file.write(b"[")
+    separator = b"\n"
+    for record in iter_node_records(graph):
+        text = json.dumps(record, indent=4).replace("\n", "\n    ")
+        file.write(separator + b"    " + text.encode())
+        separator = b",\n"
+    file.write(b"\n]" if len(graph.nodes) else b"]")
+
+def write_ndjson(file, graph):
+    lines = []
+    for record in iter_node_records(graph):
+        lines.append(json.dumps(record))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            file.write(("\n".join(lines) + "\n").encode())
+            lines = []
+    if lines:
+        file.write(("\n".join(lines) + "\n").encode())
+
+def write_npz(file, graph):
+    adjacency = graph.adjacency
+    np.savez_compressed(file, nodes=graph.nodes, edges=graph.edges, offsets=adjacency.offsets, neighbours=adjacency.neighbours, edge_rows=adjacency.edge_rows)
+
+def load_npz(filename):
+    with np.load(filename) as data:
+        adjacency = GraphAdjacency(data["offsets"], data["neighbours"], data["edge_rows"])
+        return GraphArrays(data["nodes"], data["edges"], adjacency)
+
+# Node columns plus the linked node ids of every node as a list column backed by the adjacency index
+def graph_to_arrow_table(graph):
+    pa = require_pyarrow()
+    columns = {name: pa.array(np.ascontiguousarray(graph.nodes[name])) for name in graph.nodes.dtype.names}
+    adjacency = graph.adjacency
+    columns["edges"] = pa.LargeListArray.from_arrays(pa.array(adjacency.offsets), pa.array(np.ascontiguousarray(adjacency.neighbours, dtype=np.int32)))
+    return pa.table(columns)
+
+def write_parquet(file, graph):
+    pa = require_pyarrow()
+    pa.parquet.write_table(graph_to_arrow_table(graph), file, compression="zstd")
+
+def write_arrow(file, graph):
+    pa = require_pyarrow()
+    pa.feather.write_feather(graph_to_arrow_table(graph), file, compression="zstd")
+
+WRITERS = {
+    "json": write_json,
+    "ndjson": write_ndjson,
+    "npz": write_npz,
+    "parquet": write_parquet,
+    "arrow": write_arrow,
+}
+
+# Export a parsed graph to a path or a binary file object, the format defaults to the one of the file extension
+def export_graph(destination, graph, format=None):
+    if format is None:
+        format = export_format_for(destination)
+    writer = WRITERS[format]
+    with profiler.stage("serialization", records=len(graph.nodes)):
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, "wb") as file:
+                writer(file, graph)
+        else:
+            writer(destination, graph)
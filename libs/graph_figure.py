@@ -0,0 +1,369 @@
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+import plotly.graph_objects as go
+from graph_const import material_colors, material_mapping
+from libs.graph_data_parser import MATERIAL_NAMES, NODE_DTYPE, EDGE_DTYPE, GraphArrays, build_adjacency, lookup_node_rows, unique_link_rows
+from libs.graph_profiler import profiler
+
+# Row pairs of the edges that can be drawn, each undirected link once with the lower row first.
+# Links to missing nodes and links of a node to itself are left out.
+def get_edge_rows(nodes, edges):
+    node_ids = nodes["id"]
+    return unique_link_rows(lookup_node_rows(node_ids, edges["source"]), lookup_node_rows(node_ids, edges["target"]), len(nodes))
+
+# Line segments for the edge trace, every segment is start, end and a NaN gap so Plotly breaks the line
+def get_edges(graph):
+    nodes = graph.nodes
+    low_rows, high_rows = get_edge_rows(nodes, graph.edges)
+    segments = []
+    for axis in ("x", "y", "z"):
+        coordinates = np.full((len(low_rows), 3), np.nan)
+        coordinates[:, 0] = nodes[axis][low_rows]
+        coordinates[:, 1] = nodes[axis][high_rows]
+        segments.append(coordinates.ravel())
+    return tuple(segments)
+
+DEFAULT_TRACE_CACHE_ENTRIES = 64
+
+# Least recently used cache of the parts of a figure (edge segments, hover data, decimated graphs).
+# Keys start with the part name and the content key of the graph, followed by only the settings that part uses,
+# so changing one setting rebuilds only the parts that depend on it.
+class TraceCache:
+    def __init__(self, max_entries=DEFAULT_TRACE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# Figures send sizes, edge segments and hover numbers as float32 typed arrays. float32 keeps 24 bits, a step of
+# 0.0078 at 65,536, so node positions, which the hover shows to a hundredth, are sent as float64.
+FIGURE_DTYPE = np.float32
+POSITION_DTYPE = np.float64
+POSITION_TEMPLATE = "<br>Position: (%{x:.2f}, %{y:.2f}, %{z:.2f})"
+
+# Markers are coloured by material code through a colour scale with one step per code, codes without a colour
+# share the last step
+UNKNOWN_MATERIAL_CODE = max(material_mapping) + 1
+
+def build_material_colorscale():
+    colors = [material_colors.get(material_mapping.get(code), 'purple') for code in range(UNKNOWN_MATERIAL_CODE + 1)]
+    colorscale = []
+    for code, color in enumerate(colors):
+        colorscale.append([code / len(colors), color])
+        colorscale.append([(code + 1) / len(colors), color])
+    return colorscale
+
+MATERIAL_COLORSCALE = build_material_colorscale()
+
+def material_codes(graph):
+    return np.minimum(graph.nodes["material"], UNKNOWN_MATERIAL_CODE)
+
+def material_codes_and_sizes(graph, node_radius_size):
+    return material_codes(graph), graph.nodes["radius"] * node_radius_size
+
+# Marker coloured by material code, cmin and cmax put every code in the middle of its colour step
+def material_marker(codes, sizes, symbol=None):
+    marker = dict(color=codes, colorscale=MATERIAL_COLORSCALE, cmin=-0.5, cmax=UNKNOWN_MATERIAL_CODE + 0.5, showscale=False, size=np.asarray(sizes, dtype=FIGURE_DTYPE), sizemode='diameter')
+    if symbol:
+        marker['symbol'] = symbol
+    return marker
+
+# Hover content of the node markers. Numbers go to the browser as one typed customdata array that the
+# hovertemplate formats, only the links, material and criteria that are shown are sent as text. Text is an object
+# array, which plotly validates as a whole instead of string by string.
+def prepare_hover_data(graph, show_links=False, show_material=False, show_gamma_radius=False, show_criteria=False, show_position=False):
+    nodes = graph.nodes
+    labels = []
+    if show_links:
+        labels.append(["Links: " + ", ".join(map(str, links)) for links in graph.links])
+    if show_material:
+        labels.append(np.char.add("Material: ", MATERIAL_NAMES[nodes["material"]]).tolist())
+    if show_criteria:
+        labels.append(np.char.add("Criteria: ", nodes["criteria"]).tolist())
+    columns = [nodes["id"]]
+    template = "Node ID: %{customdata[0]}"
+    hover_data = {}
+    if labels:
+        hover_data["text"] = np.array(["<br>".join(parts) for parts in zip(*labels)], dtype=object)
+        template += "<br>%{text}"
+    if show_gamma_radius:
+        columns += [nodes["gamma"], nodes["radius"]]
+        template += "<br>Gamma: %{customdata[1]:.4f}<br>Radius: %{customdata[2]:.4f}"
+    if show_position:
+        template += POSITION_TEMPLATE
+    hover_data["customdata"] = np.column_stack(columns).astype(FIGURE_DTYPE)
+    hover_data["hovertemplate"] = template + "<extra></extra>"
+    return hover_data
+
+# Traces of plain arrays sent as typed arrays, markers coloured by material code and hover content in customdata.
+# The edge segments are drawn as one more trace with show_links. Returns None for an unknown plot type.
+def build_figure(plot_type, symbol, x_data, y_data, z_data, edge_x, edge_y, edge_z, hover_data, codes, sizes, show_links=True, scene_aspectmode=None):
+    x_data, y_data, z_data = (np.asarray(values, dtype=POSITION_DTYPE) for values in (x_data, y_data, z_data))
+    marker = material_marker(codes, sizes)
+    points = dict(x=x_data, y=y_data, z=z_data, **hover_data)
+    if plot_type == 'scatter':
+        traces = [go.Scatter3d(points, mode='markers', marker=material_marker(codes, sizes, symbol))]
+    elif plot_type == 'surface':
+        traces = [go.Scatter3d(points, mode='markers', marker=marker)]
+    elif plot_type == 'line':
+        traces = [go.Scatter3d(points, mode='lines+markers', marker=marker, line=dict(color='red'))]
+    elif plot_type == 'mesh':
+        # Use intensity to map colors to a colorscale
+        intensity = np.arange(len(codes), dtype=FIGURE_DTYPE)
+        traces = [go.Mesh3d(points, opacity=0.5, intensity=intensity, colorscale='Viridis', cmin=0, cmax=len(codes) - 1),
+                  go.Scatter3d(points, mode='markers', marker=marker)]
+    else:
+        logging.error(f"Invalid plot type: {plot_type}")
+        return None
+
+    if show_links:
+        traces.append(go.Scatter3d(x=np.asarray(edge_x, dtype=FIGURE_DTYPE), y=np.asarray(edge_y, dtype=FIGURE_DTYPE), z=np.asarray(edge_z, dtype=FIGURE_DTYPE), mode='lines', line=dict(color='red')))
+    fig = go.Figure(data=traces)
+    if scene_aspectmode:
+        fig.layout.scene.aspectmode = scene_aspectmode
+    return fig
+
+# Largest number of markers drawn in one scene before nodes are merged into clusters
+DEFAULT_POINT_BUDGET = 50000
+MAX_GRID_DIVISIONS = 1 << 10
+
+# Nodes merged into a voxel grid, graph holds one node per occupied voxel and the links between voxels
+class GraphLevelOfDetail:
+    def __init__(self, graph, counts, representatives, cell_size, node_count):
+        self.graph = graph
+        self.counts = counts  # Source nodes in every cluster
+        self.representatives = representatives  # Source row of the first node in every cluster
+        self.cell_size = cell_size
+        self.node_count = node_count
+
+    def __len__(self):
+        return len(self.graph)
+
+    @property
+    def decimated(self):
+        return len(self.graph) < self.node_count
+
+def graph_bounds(graph):
+    nodes = graph.nodes
+    if len(nodes) == 0:
+        return np.zeros(3), np.zeros(3)
+    positions = np.column_stack((nodes["x"], nodes["y"], nodes["z"]))
+    return positions.min(axis=0), positions.max(axis=0)
+
+# Nodes inside the box from low to high and the links between them, node ids are kept
+def crop_graph(graph, low, high):
+    nodes = graph.nodes
+    node_rows = graph.spatial_index.query_box(low, high)
+    inside = np.zeros(len(nodes), dtype=bool)
+    inside[node_rows] = True
+    source_rows = lookup_node_rows(nodes["id"], graph.edges["source"])
+    target_rows = lookup_node_rows(nodes["id"], graph.edges["target"])
+    edges = graph.edges[(source_rows >= 0) & (target_rows >= 0) & inside[source_rows] & inside[target_rows]]
+    cropped_nodes = nodes[node_rows]
+    return GraphArrays(cropped_nodes, edges, build_adjacency(cropped_nodes["id"], edges), graph.max_nodes)
+
+MAX_SCENE_SELECTIONS = 4
+
+# Graphs of a level merged into one scene drawn as one marker trace and one edge trace. Node ids restart in every
+# graph file, so every graph gets an id offset above the ids of the graphs before it and its edges are remapped.
+# The offsets clear the edge endpoints too, so an edge to a missing node can't land on a node of the next graph.
+class LevelScene:
+    def __init__(self, graphs, graph_names):
+        self.graph_names = list(graph_names)
+        id_counts = [max_graph_id(graph) + 1 for graph in graphs]
+        self.id_offsets = np.concatenate(([0], np.cumsum(id_counts)[:-1])).astype(np.int64)
+        self.graphs = [graph.with_id_offset(int(offset)) for graph, offset in zip(graphs, self.id_offsets)]
+        self.selections = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(graph) for graph in self.graphs)
+
+    # Merged graph of the graphs at the given upload indices, or of the whole level when indices is None, built once
+    # per selection. Graphs are picked by index since uploads of a level can share a file name. Only the
+    # MAX_SCENE_SELECTIONS most recently used selections are kept so the scene doesn't outgrow its size in the store.
+    def select(self, indices=None):
+        selection = tuple(index for index in range(len(self.graphs)) if indices is None or index in indices)
+        with self.lock:
+            if selection in self.selections:
+                self.selections.move_to_end(selection)
+            else:
+                self.selections[selection] = GraphArrays.concatenate(self.graphs[index] for index in selection)
+                while len(self.selections) > MAX_SCENE_SELECTIONS:
+                    self.selections.popitem(last=False)
+            return self.selections[selection]
+
+# Highest node id a graph uses, as a node or as an edge endpoint, -1 for a graph without nodes or edges
+def max_graph_id(graph):
+    ids = [int(values.max()) for values in (graph.nodes["id"], graph.edges["source"], graph.edges["target"]) if len(values)]
+    return max(ids, default=-1)
+
+# Voxel of every node on a grid of cubic cells with the given number of cells along the longest side
+def voxel_keys(positions, low, extent, divisions):
+    cell_size = extent / divisions if extent > 0 else 1.0
+    cells = np.minimum(((positions - low) / cell_size).astype(np.int64), divisions - 1)
+    return (cells[:, 0] * divisions + cells[:, 1]) * divisions + cells[:, 2], cell_size
+
+# Merge nodes into voxels so at most point_budget markers are drawn, using the finest grid whose occupied voxels
+# still fit the budget. Graphs within the budget are returned unchanged.
+def decimate_graph(graph, point_budget=DEFAULT_POINT_BUDGET):
+    nodes = graph.nodes
+    node_count = len(nodes)
+    if node_count <= point_budget:
+        return GraphLevelOfDetail(graph, np.ones(node_count, dtype=np.int64), np.arange(node_count), 0.0, node_count)
+
+    with profiler.stage("level of detail", records=node_count):
+        low, high = graph_bounds(graph)
+        positions = np.column_stack((nodes["x"], nodes["y"], nodes["z"]))
+        extent = float((high - low).max())
+        # Double the divisions until the budget is exceeded, then bisect between the last two
+        fitting, exceeding = 1, None
+        while fitting < MAX_GRID_DIVISIONS:
+            if len(np.unique(voxel_keys(positions, low, extent, fitting * 2)[0])) > point_budget:
+                exceeding = fitting * 2
+                break
+            fitting *= 2
+        while exceeding is not None and exceeding - fitting > 1:
+            divisions = (fitting + exceeding) // 2
+            if len(np.unique(voxel_keys(positions, low, extent, divisions)[0])) > point_budget:
+                exceeding = divisions
+            else:
+                fitting = divisions
+        keys, cell_size = voxel_keys(positions, low, extent, fitting)
+
+        _, representatives, clusters, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        clusters = clusters.ravel()
+        cluster_nodes = np.zeros(len(counts), dtype=NODE_DTYPE)
+        cluster_nodes["id"] = np.arange(1, len(counts) + 1)
+        for axis in ("x", "y", "z", "gamma"):
+            cluster_nodes[axis] = np.bincount(clusters, weights=nodes[axis], minlength=len(counts)) / counts
+        # Markers grow with the cube root of the merged nodes so their volume follows the node count
+        cluster_nodes["radius"] = np.bincount(clusters, weights=nodes["radius"], minlength=len(counts)) / counts * np.cbrt(counts)
+        cluster_nodes["material"] = dominant_values(clusters, nodes["material"], len(counts))
+        cluster_nodes["criteria"] = np.where(counts == 1, nodes["criteria"][representatives], "")
+
+        # Links between different voxels, each pair of voxels once
+        low_rows, high_rows = get_edge_rows(nodes, graph.edges)
+        low_clusters = np.minimum(clusters[low_rows], clusters[high_rows])
+        high_clusters = np.maximum(clusters[low_rows], clusters[high_rows])
+        keep = low_clusters != high_clusters
+        link_keys = np.unique(low_clusters[keep] * len(counts) + high_clusters[keep])
+        cluster_edges = np.zeros(len(link_keys), dtype=EDGE_DTYPE)
+        cluster_edges["source"] = link_keys // len(counts) + 1
+        cluster_edges["target"] = link_keys % len(counts) + 1
+
+        cluster_graph = GraphArrays(cluster_nodes, cluster_edges, build_adjacency(cluster_nodes["id"], cluster_edges))
+        logging.info(f"Decimated {node_count} nodes into {len(counts)} clusters of cell size {cell_size:.2f}")
+        return GraphLevelOfDetail(cluster_graph, counts, representatives, cell_size, node_count)
+
+# Most frequent value of every cluster, the lowest value wins a tie
+def dominant_values(clusters, values, cluster_count):
+    unique_values, value_codes = np.unique(values, return_inverse=True)
+    value_counts = np.zeros((cluster_count, len(unique_values)), dtype=np.int64)
+    np.add.at(value_counts, (clusters, value_codes.ravel()), 1)
+    return unique_values[value_counts.argmax(axis=1)]
+
+# Hover content of the cluster markers, the first node id and node count of every cluster
+def prepare_cluster_hover_data(level_of_detail, source_graph, show_material=False, show_position=False):
+    node_ids = source_graph.nodes["id"][level_of_detail.representatives]
+    hover_data = {"customdata": np.column_stack((node_ids, level_of_detail.counts)).astype(FIGURE_DTYPE)}
+    template = "Nodes: %{customdata[1]}<br>First Node ID: %{customdata[0]}"
+    if show_material:
+        hover_data["text"] = np.char.add("Material: ", MATERIAL_NAMES[level_of_detail.graph.nodes["material"]]).astype(object)
+        template += "<br>%{text}"
+    if show_position:
+        template += POSITION_TEMPLATE
+    hover_data["hovertemplate"] = template + "<extra></extra>"
+    return hover_data
+
+# Highlight a path found in graph with a thick line through its nodes and markers on the start and goal
+def add_path_traces(fig, graph, path):
+    nodes = graph.nodes[path.rows]
+    fig.add_trace(go.Scatter3d(x=nodes["x"], y=nodes["y"], z=nodes["z"], mode='lines', line=dict(color='lime', width=8), name=f"Path {path.node_ids[0]} to {path.node_ids[-1]}", hoverinfo='skip'))
+    ends = nodes[[0, -1]]
+    fig.add_trace(go.Scatter3d(x=ends["x"], y=ends["y"], z=ends["z"], mode='markers+text', marker=dict(color='lime', size=10, symbol='diamond'), text=["Start", "Goal"], name="Path ends"))
+
+DIFF_COLORS = {"added": "limegreen", "changed": "orange", "removed": "red"}
+
+# Highlight the changes from old_graph to the graph on screen: added and changed nodes at their new positions,
+# removed nodes at their old positions, and the links added or removed between them
+def add_diff_traces(fig, graph, old_graph, diff):
+    node_sets = (
+        ("added", graph, diff.added_ids),
+        ("changed", graph, diff.changed_ids),
+        ("removed", old_graph, diff.removed_ids),
+    )
+    for kind, source_graph, ids in node_sets:
+        rows = lookup_node_rows(source_graph.nodes["id"], ids)
+        nodes = source_graph.nodes[rows[rows >= 0]]
+        if len(nodes):
+            fig.add_trace(go.Scatter3d(x=nodes["x"], y=nodes["y"], z=nodes["z"], mode='markers', marker=dict(color=DIFF_COLORS[kind], size=8, symbol='diamond-open'), customdata=nodes["id"], hovertemplate=f"{kind.capitalize()} node %{{customdata}}<extra></extra>", name=f"{kind.capitalize()} nodes ({len(nodes)})"))
+    for kind, source_graph, links in (("added", graph, diff.added_links), ("removed", old_graph, diff.removed_links)):
+        if not len(links):
+            continue
+        source_rows = lookup_node_rows(source_graph.nodes["id"], links[:, 0])
+        target_rows = lookup_node_rows(source_graph.nodes["id"], links[:, 1])
+        valid = (source_rows >= 0) & (target_rows >= 0)
+        segments = np.full((int(valid.sum()), 3, 3), np.nan, dtype=FIGURE_DTYPE)
+        for axis, name in enumerate(("x", "y", "z")):
+            segments[:, 0, axis] = source_graph.nodes[name][source_rows[valid]]
+            segments[:, 1, axis] = source_graph.nodes[name][target_rows[valid]]
+        segments = segments.reshape(-1, 3)
+        fig.add_trace(go.Scatter3d(x=segments[:, 0], y=segments[:, 1], z=segments[:, 2], mode='lines', line=dict(color=DIFF_COLORS[kind], width=6), hoverinfo='skip', name=f"{kind.capitalize()} links ({len(links)})"))
+
+# Figure of a graph for both viewers with its path and diff overlays, returns the figure, None for an unknown plot
+# type, and the level of detail when a point budget is given. Every part is cached in trace_cache by the graph
+# content and only the settings it depends on, so a new figure only rebuilds the parts whose settings changed.
+# Links are drawn with draw_links, show_links adds them to the hover text. progress gets the share done and the
+# current step.
+def build_graph_figure(graph, trace_cache, plot_type='scatter', symbol=None, show_links=False, show_material=False, show_gamma_radius=False, show_criteria=False, show_position=False,
+                       node_radius_size=50, point_budget=None, draw_links=True, scene_aspectmode=None, path=None, diff=None, original=None, progress=None):
+    progress = progress or (lambda fraction, text: None)
+    full_graph = graph
+    # Merge nodes into clusters when the graph has more nodes than the point budget
+    progress(0.2, "Level of detail")
+    level_of_detail = trace_cache.get_or_build(("level of detail", graph.content_key, point_budget), lambda: decimate_graph(graph, point_budget)) if point_budget else None
+    if level_of_detail and level_of_detail.decimated:
+        source_graph, graph = graph, level_of_detail.graph
+    graph_key = graph.content_key
+
+    progress(0.4, "Edge segments")
+    with profiler.stage("edge segments", records=len(graph.edges) if draw_links else 0):
+        edge_x, edge_y, edge_z = trace_cache.get_or_build(("edge segments", graph_key), lambda: get_edges(graph)) if draw_links else ([], [], [])
+    progress(0.6, "Hover text")
+    with profiler.stage("hover text", records=len(graph)):
+        if level_of_detail and level_of_detail.decimated:
+            hover_data = trace_cache.get_or_build(("cluster hover data", source_graph.content_key, point_budget, show_material, show_position), lambda: prepare_cluster_hover_data(level_of_detail, source_graph, show_material, show_position))
+        else:
+            hover_data = trace_cache.get_or_build(("hover data", graph_key, show_links, show_material, show_gamma_radius, show_criteria, show_position), lambda: prepare_hover_data(graph, show_links, show_material, show_gamma_radius, show_criteria, show_position))
+    codes, sizes = material_codes_and_sizes(graph, node_radius_size)
+
+    progress(0.8, "Figure")
+    with profiler.stage("figure", records=len(graph)):
+        fig = build_figure(plot_type, symbol, graph.nodes["x"], graph.nodes["y"], graph.nodes["z"], edge_x, edge_y, edge_z, hover_data, codes, sizes, draw_links, scene_aspectmode)
+    if fig is not None and path is not None:
+        add_path_traces(fig, full_graph, path)
+    if fig is not None and diff is not None:
+        add_diff_traces(fig, full_graph, original, diff)
+    return fig, level_of_detail
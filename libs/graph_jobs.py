@@ -0,0 +1,80 @@
+import logging
+import queue
+import threading
+from libs.graph_data_parser import collect_graph_chunks, iter_graph_chunks, open_binary_file
+
+PROGRESS_BLOCK_SIZE = 1 << 18  # Bytes read between progress updates and cancel checks
+PROGRESS_CHUNK_SIZE = 4096  # Nodes or edges decoded between progress updates and cancel checks
+
+class JobCancelled(Exception):
+    pass
+
+# Work run on a background thread. The work gets the job to report progress and to check for cancellation,
+# the UI thread reads the progress, result, error or cancellation back with poll() so it never blocks.
+class BackgroundJob:
+    def __init__(self, work, *args):
+        self.work = work
+        self.args = args
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            result = self.work(self, *self.args)
+            self.check_cancelled()
+            self.messages.put(("done", result))
+        except JobCancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            logging.exception(f"Background job failed: {e}")
+            self.messages.put(("error", e))
+
+    def progress(self, fraction, text):
+        self.check_cancelled()
+        self.messages.put(("progress", (fraction, text)))
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    # Messages sent since the last poll as (kind, value) pairs, kind is progress, done, error or cancelled
+    def poll(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+# Decode a graph file with progress by bytes decoded, graphs in the cache are loaded without decoding. The file is
+# memory mapped, so it is hashed and streamed from the page cache without a copy of the whole file.
+def load_graph_file(job, file_path, cache=None):
+    job.progress(0.0, "Reading")
+    with open_binary_file(file_path) as binary_data:
+        key = cache.content_key(binary_data) if cache is not None else None
+        graph = cache.get(key) if cache is not None else None
+        if graph is None:
+            chunks = iter_graph_chunks(binary_data, PROGRESS_CHUNK_SIZE, PROGRESS_BLOCK_SIZE)
+            graph = collect_graph_chunks(report_chunks(job, chunks, len(binary_data)))
+            job.check_cancelled()
+            if cache is not None:
+                cache.put(key, graph)
+    return graph
+
+# Chunks of a decode passed on unchanged, the share of the input decoded is reported after every chunk
+def report_chunks(job, chunks, total_bytes):
+    for chunk in chunks:
+        job.progress(chunk.bytes_read / max(total_bytes, 1), "Parsing")
+        yield chunk
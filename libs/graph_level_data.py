@@ -0,0 +1,105 @@
+import glob
+import os
+import re
+import numpy as np
+from libs.graph_data_parser import NODE_DTYPE, EDGE_DTYPE, GraphAdjacency, GraphArrays, build_adjacency
+
+# Merged layouts of a whole level, every row also carries the graph id it came from
+LEVEL_NODE_DTYPE = np.dtype([("graph", "<i4")] + NODE_DTYPE.descr)
+LEVEL_EDGE_DTYPE = np.dtype([("graph", "<i4")] + EDGE_DTYPE.descr)
+
+GRAPH_FILE_PATTERN = re.compile(r"graph(\d+)\.dat$", re.IGNORECASE)
+
+def graph_id_from_filename(filename):
+    match = GRAPH_FILE_PATTERN.search(os.path.basename(filename))
+    return int(match.group(1)) if match else None
+
+# Expand directories and glob patterns into a sorted list of graph*.dat files
+def find_graph_files(inputs):
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path) if GRAPH_FILE_PATTERN.search(name))
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path))
+        else:
+            files.append(path)
+    # The same file given twice, like a directory and a pattern that both match it, is parsed once
+    unique_files = {}
+    for path in files:
+        unique_files.setdefault(os.path.realpath(path), path)
+    return sorted(unique_files.values(), key=lambda path: (graph_id_from_filename(path) is None, graph_id_from_filename(path) or 0, path))
+
+# Graph ids used by more than one of the files, with the files that use them
+def duplicate_graph_ids(graph_files):
+    files_by_id = {}
+    for path in graph_files:
+        files_by_id.setdefault(graph_id_from_filename(path), []).append(path)
+    return {graph_id: paths for graph_id, paths in files_by_id.items() if graph_id is not None and len(paths) > 1}
+
+# Graphs are stored one after another in the order of graph_ids, a level holds every graph id once so the graph
+# column of a row names a single graph
+def build_level_dataset(graph_ids, graphs):
+    duplicates = sorted({graph_id for graph_id in graph_ids if graph_ids.count(graph_id) > 1})
+    if duplicates:
+        raise ValueError(f"Graph ids {duplicates} are given more than once, a level holds every graph id once")
+    nodes = np.zeros(sum(len(graph.nodes) for graph in graphs), dtype=LEVEL_NODE_DTYPE)
+    edges = np.zeros(sum(len(graph.edges) for graph in graphs), dtype=LEVEL_EDGE_DTYPE)
+    node_start = 0
+    edge_start = 0
+    for graph_id, graph in zip(graph_ids, graphs):
+        node_end = node_start + len(graph.nodes)
+        edge_end = edge_start + len(graph.edges)
+        nodes["graph"][node_start:node_end] = graph_id
+        edges["graph"][edge_start:edge_end] = graph_id
+        for name in NODE_DTYPE.names:
+            nodes[name][node_start:node_end] = graph.nodes[name]
+        for name in EDGE_DTYPE.names:
+            edges[name][edge_start:edge_end] = graph.edges[name]
+        node_start = node_end
+        edge_start = edge_end
+    return nodes, edges
+
+def save_level_dataset(filename, graph_ids, graphs, level=None):
+    nodes, edges = build_level_dataset(graph_ids, graphs)
+    node_counts = np.array([len(graph.nodes) for graph in graphs], dtype=np.int64)
+    edge_counts = np.array([len(graph.edges) for graph in graphs], dtype=np.int64)
+    np.savez_compressed(filename, graph_ids=np.asarray(graph_ids, dtype=np.int32), nodes=nodes, edges=edges, node_counts=node_counts, edge_counts=edge_counts, level=np.int32(level or 0))
+    return nodes, edges
+
+# Graph ids, rows and the node and edge rows of every graph as (start, end) pairs in the order of graph_ids.
+# Datasets written before the row counts were stored have unique graph ids, their counts are taken from the rows.
+def load_level_dataset(filename):
+    with np.load(filename) as dataset:
+        graph_ids, nodes, edges = dataset["graph_ids"], dataset["nodes"], dataset["edges"]
+        if "node_counts" in dataset:
+            node_counts, edge_counts = dataset["node_counts"], dataset["edge_counts"]
+        else:
+            node_counts = [np.count_nonzero(nodes["graph"] == graph_id) for graph_id in graph_ids]
+            edge_counts = [np.count_nonzero(edges["graph"] == graph_id) for graph_id in graph_ids]
+    return graph_ids, nodes, edges, row_ranges(node_counts), row_ranges(edge_counts)
+
+def row_ranges(counts):
+    bounds = np.concatenate(([0], np.cumsum(counts, dtype=np.int64))).tolist()
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# Load a level dataset as one GraphArrays per graph, in the order of graph_ids
+def load_level_graphs(filename):
+    graph_ids, nodes, edges, node_ranges, edge_ranges = load_level_dataset(filename)
+    graphs = []
+    for (node_start, node_end), (edge_start, edge_end) in zip(node_ranges, edge_ranges):
+        graph_nodes = np.ascontiguousarray(nodes[node_start:node_end][list(NODE_DTYPE.names)]).astype(NODE_DTYPE)
+        graph_edges = np.ascontiguousarray(edges[edge_start:edge_end][list(EDGE_DTYPE.names)]).astype(EDGE_DTYPE)
+        graphs.append(GraphArrays(graph_nodes, graph_edges, build_adjacency(graph_nodes["id"], graph_edges)))
+    return graph_ids.tolist(), graphs
+
+# Load a level dataset as one GraphArrays, the adjacency is built per graph since node ids restart in every graph
+def load_level_graph(filename):
+    graph_ids, nodes, edges, node_ranges, edge_ranges = load_level_dataset(filename)
+    adjacencies = []
+    edge_counts = []
+    for (node_start, node_end), (edge_start, edge_end) in zip(node_ranges, edge_ranges):
+        graph_edges = edges[edge_start:edge_end]
+        adjacencies.append(build_adjacency(nodes["id"][node_start:node_end], graph_edges))
+        edge_counts.append(len(graph_edges))
+    return GraphArrays(nodes, edges, GraphAdjacency.concatenate(adjacencies, edge_counts))
@@ -0,0 +1,189 @@
+import heapq
+import math
+import sys
+import threading
+import numpy as np
+from graph_const import material_mapping
+from libs.graph_data_parser import list_nbytes, lookup_node_rows
+
+# Graphs up to this many nodes can have all pair hop counts and distances computed
+DEFAULT_MATRIX_MAX_NODES = 512
+
+# Route between two nodes, rows index graph.nodes and node_ids are the matching node ids
+class GraphPath:
+    def __init__(self, rows, node_ids, distance, visited):
+        self.rows = rows
+        self.node_ids = node_ids
+        self.distance = distance
+        self.visited = visited  # Nodes settled by the search, shows how much of the graph was explored
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def hops(self):
+        return len(self.rows) - 1
+
+# Shortest paths over the links of a graph weighted by the Euclidean distance between the linked nodes.
+# Links can be limited to some edge types and nodes to some materials, the start and goal are always allowed.
+class GraphRouter:
+    def __init__(self, graph):
+        self.graph = graph
+        nodes = graph.nodes
+        adjacency = graph.adjacency
+        self.positions = np.column_stack((nodes["x"], nodes["y"], nodes["z"]))
+        neighbour_rows = lookup_node_rows(nodes["id"], adjacency.neighbours)
+        owner_rows = np.repeat(np.arange(len(adjacency)), adjacency.degrees())
+        weights = np.linalg.norm(self.positions[owner_rows] - self.positions[neighbour_rows], axis=1)
+        self.edge_types = graph.edges["type"][adjacency.edge_rows]
+
+        # The searches walk plain lists, indexing them is much faster than indexing arrays one item at a time
+        self.offsets = adjacency.offsets.tolist()
+        self.neighbour_rows = neighbour_rows.tolist()
+        self.weights = weights.tolist()
+        self.edge_type_list = self.edge_types.tolist()
+        self.position_list = self.positions.tolist()
+        self.matrix_lock = threading.Lock()
+        self.matrices = {}
+
+    # Bytes held by the router counted from the list lengths, the graph it belongs to isn't included. Edge types are
+    # small ints Python shares, so only their list counts.
+    def nbytes(self):
+        node_count, entry_count = len(self.position_list), len(self.neighbour_rows)
+        int_size, float_size = sys.getsizeof(0), sys.getsizeof(0.0)
+        size = self.positions.nbytes + self.edge_types.nbytes
+        size += list_nbytes(len(self.offsets)) + len(self.offsets) * int_size
+        size += list_nbytes(entry_count) * 3 + entry_count * (int_size + float_size)
+        size += list_nbytes(node_count) + node_count * (list_nbytes(3) + 3 * float_size)
+        with self.matrix_lock:
+            return size + sum(hops.nbytes + distances.nbytes for hops, distances in self.matrices.values())
+
+    def node_rows(self, node_ids):
+        return lookup_node_rows(self.graph.nodes["id"], node_ids)
+
+    # Per node flags of the nodes the path may pass through, None when every node is allowed
+    def allowed_nodes(self, materials):
+        if materials is None:
+            return None
+        codes = [code for code, name in material_mapping.items() if name in materials or code in materials]
+        return np.isin(self.graph.nodes["material"], codes).tolist()
+
+    def search(self, start_row, goal_rows, edge_types=None, materials=None, heuristic_row=None):
+        allowed_types = set(edge_types) if edge_types is not None else None
+        allowed_nodes = self.allowed_nodes(materials)
+        positions = self.position_list
+        offsets, neighbour_rows, weights, types = self.offsets, self.neighbour_rows, self.weights, self.edge_type_list
+        remaining = set(goal_rows)
+
+        # A* with the straight line distance to the goal, which never overestimates Euclidean weighted paths
+        if heuristic_row is not None:
+            goal = positions[heuristic_row]
+            estimate = lambda row: math.dist(positions[row], goal)
+        else:
+            estimate = lambda row: 0.0
+
+        distances = {start_row: 0.0}
+        previous = {start_row: -1}
+        settled = set()
+        heap = [(estimate(start_row), 0.0, start_row)]
+        while heap and remaining:
+            _, distance, row = heapq.heappop(heap)
+            if row in settled:
+                continue
+            settled.add(row)
+            remaining.discard(row)
+            if allowed_nodes is not None and not allowed_nodes[row] and row != start_row:
+                continue  # A goal of a filtered material, reached but not passed through
+            for entry in range(offsets[row], offsets[row + 1]):
+                neighbour = neighbour_rows[entry]
+                if neighbour < 0 or neighbour in settled:
+                    continue
+                if allowed_types is not None and types[entry] not in allowed_types:
+                    continue
+                if allowed_nodes is not None and not allowed_nodes[neighbour] and neighbour not in goal_rows:
+                    continue
+                new_distance = distance + weights[entry]
+                if new_distance < distances.get(neighbour, math.inf):
+                    distances[neighbour] = new_distance
+                    previous[neighbour] = row
+                    heapq.heappush(heap, (new_distance + estimate(neighbour), new_distance, neighbour))
+        return distances, previous, settled
+
+    def build_path(self, goal_row, distances, previous, settled):
+        if goal_row not in settled:
+            return None
+        rows = []
+        row = goal_row
+        while row >= 0:
+            rows.append(row)
+            row = previous[row]
+        rows = np.array(rows[::-1], dtype=np.int64)
+        return GraphPath(rows, self.graph.nodes["id"][rows], distances[goal_row], len(settled))
+
+    # Shortest path between two node ids with A*, None when the goal can't be reached
+    def find_path(self, start_id, goal_id, edge_types=None, materials=None):
+        start_row, goal_row = self.node_rows([start_id, goal_id]).tolist()
+        if start_row < 0 or goal_row < 0:
+            return None
+        distances, previous, settled = self.search(start_row, {goal_row}, edge_types, materials, heuristic_row=goal_row)
+        return self.build_path(goal_row, distances, previous, settled)
+
+    # Shortest paths from one node to many with a single Dijkstra search that stops once every goal is reached
+    def find_paths(self, start_id, goal_ids, edge_types=None, materials=None):
+        goal_rows = self.node_rows(goal_ids).tolist()
+        start_row = self.node_rows([start_id])[0]
+        if start_row < 0:
+            return [None] * len(goal_rows)
+        distances, previous, settled = self.search(start_row, {row for row in goal_rows if row >= 0}, edge_types, materials)
+        return [self.build_path(row, distances, previous, settled) if row >= 0 else None for row in goal_rows]
+
+    # Distance from one node to every node, infinite where it can't be reached
+    def distances_from(self, start_id, edge_types=None, materials=None):
+        result = np.full(len(self.graph.nodes), np.inf)
+        start_row = self.node_rows([start_id])[0]
+        if start_row >= 0:
+            distances, _, settled = self.search(start_row, set(range(len(self.graph.nodes))), edge_types, materials)
+            for row in settled:
+                result[row] = distances[row]
+        return result
+
+    # All pair hop counts and distances of a small graph as two (nodes, nodes) arrays, computed once per filter
+    def distance_matrix(self, edge_types=None, materials=None, max_nodes=DEFAULT_MATRIX_MAX_NODES):
+        node_count = len(self.graph.nodes)
+        if node_count > max_nodes:
+            raise ValueError(f"Graph has {node_count} nodes, the distance matrix is limited to {max_nodes}")
+        key = (tuple(sorted(edge_types)) if edge_types is not None else None, tuple(sorted(materials)) if materials is not None else None)
+        with self.matrix_lock:
+            if key not in self.matrices:
+                self.matrices[key] = self.build_matrices(edge_types, materials)
+            return self.matrices[key]
+
+    def build_matrices(self, edge_types, materials):
+        node_count = len(self.graph.nodes)
+        owner_rows = np.repeat(np.arange(node_count), np.diff(self.offsets))
+        neighbour_rows = np.array(self.neighbour_rows, dtype=np.int64)
+        keep = neighbour_rows >= 0
+        if edge_types is not None:
+            keep &= np.isin(self.edge_types, list(edge_types))
+        allowed_nodes = self.allowed_nodes(materials)
+        hops = np.full((node_count, node_count), np.inf)
+        distances = np.full((node_count, node_count), np.inf)
+        np.minimum.at(hops, (owner_rows[keep], neighbour_rows[keep]), 1.0)
+        np.minimum.at(distances, (owner_rows[keep], neighbour_rows[keep]), np.array(self.weights)[keep])
+        np.fill_diagonal(hops, 0.0)
+        np.fill_diagonal(distances, 0.0)
+
+        # Floyd-Warshall, paths only pass through allowed nodes but may start or end anywhere
+        for row in range(node_count):
+            if allowed_nodes is not None and not allowed_nodes[row]:
+                continue
+            np.minimum(hops, hops[:, row, None] + hops[None, row, :], out=hops)
+            np.minimum(distances, distances[:, row, None] + distances[None, row, :], out=distances)
+        return hops, distances
+
+# One router per parsed graph, kept with the graph and shared by every lookup of it
+routers_lock = threading.Lock()
+
+def get_router(graph):
+    with routers_lock:
+        return graph.derived_part("router", GraphRouter)
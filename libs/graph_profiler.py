@@ -0,0 +1,139 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Pipeline stages in the order they run, used to order the summary
+STAGES = [
+    "read",
+    "scan",
+    "node decode",
+    "edge decode",
+    "adjacency",
+    "analysis",
+    "diff",
+    "level of detail",
+    "edge segments",
+    "hover text",
+    "figure",
+    "serialization",
+]
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.records = 0
+        self.bytes = 0
+
+class StageTimer:
+    def __init__(self):
+        self.records = 0
+        self.bytes = 0
+
+# Shared do-nothing timer handed out while profiling is disabled, counts set on it are simply dropped
+class NullStageTimer:
+    records = 0
+    bytes = 0
+
+    def __setattr__(self, name, value):
+        pass
+
+NULL_STAGE_TIMER = NullStageTimer()
+
+# Profiler that stages are recorded in instead while recording_into is active, kept per thread and context
+RUN_PROFILER = contextvars.ContextVar("run_profiler", default=None)
+
+class GraphProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    # Record the stages of the calling thread in run until the block ends, whatever this profiler's setting is.
+    # The web app gives every rerun its own profiler so sessions don't switch off or mix each other's timings.
+    @contextmanager
+    def recording_into(self, run):
+        token = RUN_PROFILER.set(run)
+        try:
+            yield run
+        finally:
+            RUN_PROFILER.reset(token)
+
+    # The profiler stages are recorded in right now
+    @property
+    def active(self):
+        return RUN_PROFILER.get() or self
+
+    # Time a block of work, the yielded timer takes the number of records and bytes it processed
+    @contextmanager
+    def stage(self, name, records=0, bytes=0):
+        target = self.active
+        if not target.enabled:
+            yield NULL_STAGE_TIMER
+            return
+        timer = StageTimer()
+        timer.records = records
+        timer.bytes = bytes
+        start_time = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            target.add(name, time.perf_counter() - start_time, timer.records, timer.bytes)
+
+    def add(self, name, seconds, records=0, bytes=0, calls=1):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.calls += calls
+            stats.seconds += seconds
+            stats.records += records
+            stats.bytes += bytes
+
+    def snapshot(self):
+        with self.lock:
+            return {name: (stats.calls, stats.seconds, stats.records, stats.bytes) for name, stats in self.stages.items()}
+
+    # Merge the snapshot of another profiler, e.g. one taken in a worker process
+    def merge(self, snapshot):
+        for name, (calls, seconds, records, bytes) in snapshot.items():
+            self.add(name, seconds, records, bytes, calls)
+
+    def summary_rows(self):
+        snapshot = self.snapshot()
+        names = [name for name in STAGES if name in snapshot] + sorted(name for name in snapshot if name not in STAGES)
+        rows = []
+        for name in names:
+            calls, seconds, records, bytes = snapshot[name]
+            rows.append({
+                "stage": name,
+                "calls": calls,
+                "time (ms)": round(seconds * 1000, 3),
+                "records": records,
+                "records/s": round(records / seconds) if seconds and records else 0,
+                "MB": round(bytes / 1e6, 3),
+                "MB/s": round(bytes / seconds / 1e6, 2) if seconds and bytes else 0,
+            })
+        return rows
+
+    def format_summary(self):
+        rows = self.summary_rows()
+        if not rows:
+            return "No timings recorded"
+        headers = list(rows[0].keys())
+        widths = [max(len(header), *(len(str(row[header])) for row in rows)) for header in headers]
+        lines = ["  ".join(header.ljust(width) for header, width in zip(headers, widths))]
+        for row in rows:
+            lines.append("  ".join(str(row[header]).ljust(width) for header, width in zip(headers, widths)))
+        return "\n".join(lines)
+
+profiler = GraphProfiler(enabled=os.environ.get("IGI_GRAPH_PROFILE", "") not in ("", "0"))
@@ -0,0 +1,172 @@
+import numpy as np
+
+DEFAULT_NODES_PER_CELL = 4
+QUERY_BATCH_SIZE = 4096  # At most 65536 so the query indices of a batch fit uint16
+
+def as_points(points):
+    points = np.asarray(points, dtype=np.float64)
+    return points.reshape(-1, 3), points.ndim == 1
+
+# Cell size that gives about node_count / nodes_per_cell cells, axes narrower than one cell (like the height
+# of a flat level) count as a single cell so they don't shrink the cells of the other axes
+def choose_cell_size(extent, node_count, nodes_per_cell=DEFAULT_NODES_PER_CELL):
+    largest = float(extent.max())
+    if largest <= 0:
+        return 1.0
+    target = max(node_count / nodes_per_cell, 1.0)
+    low, high = largest / target, largest
+    for _ in range(50):
+        cell_size = (low + high) / 2
+        if np.prod(np.maximum(extent / cell_size, 1.0)) > target:
+            low = cell_size
+        else:
+            high = cell_size
+    return high
+
+# Uniform grid over node positions for nearest, radius and box queries. Rows are sorted by cell so the rows of
+# one cell are a slice of order, every query works on many points at once and returns node rows.
+class GraphSpatialIndex:
+    def __init__(self, positions, nodes_per_cell=DEFAULT_NODES_PER_CELL):
+        self.positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(-1, 3)
+        if len(self.positions):
+            self.low = self.positions.min(axis=0)
+            extent = self.positions.max(axis=0) - self.low
+        else:
+            self.low = np.zeros(3)
+            extent = np.zeros(3)
+        self.cell_size = choose_cell_size(extent, len(self.positions), nodes_per_cell)
+        self.dims = np.floor(extent / self.cell_size).astype(np.int64) + 1
+        keys = self.cell_keys(self.cell_coordinates(self.positions))
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    @staticmethod
+    def from_nodes(nodes, nodes_per_cell=DEFAULT_NODES_PER_CELL):
+        return GraphSpatialIndex(np.column_stack((nodes["x"], nodes["y"], nodes["z"])), nodes_per_cell)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.positions, self.low, self.dims, self.order, self.sorted_keys))
+
+    # Cells of the points clipped to the grid, a point outside the grid starts its search in the nearest cell
+    def cell_coordinates(self, points):
+        cells = np.floor((points - self.low) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.dims - 1)
+
+    def cell_keys(self, cells):
+        return (cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2]
+
+    # Pairs of query index and node row for every node in the given cells, cells outside the grid are skipped
+    def cell_rows(self, query_indices, cells):
+        inside = np.all((cells >= 0) & (cells < self.dims), axis=1)
+        query_indices = query_indices[inside]
+        keys = self.cell_keys(cells[inside])
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        counts = np.searchsorted(self.sorted_keys, keys, side="right") - starts
+        first_pairs = np.cumsum(counts) - counts
+        slots = np.repeat(starts - first_pairs, counts) + np.arange(counts.sum())
+        return np.repeat(query_indices, counts), self.order[slots]
+
+    # Cell offsets at Chebyshev distance ring from the centre cell, limited to the size of the grid
+    def ring_offsets(self, ring):
+        reach = np.minimum(ring, self.dims - 1)
+        axes = [np.arange(-axis_reach, axis_reach + 1) for axis_reach in reach]
+        offsets = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+        return offsets[np.abs(offsets).max(axis=1) == ring]
+
+    # The k nearest nodes of every point as distances and rows of shape (points, k), nearest first.
+    # Rings of cells are searched outwards until the k-th distance is closer than the next ring.
+    def query_nearest(self, points, k=1):
+        points, single = as_points(points)
+        distances = np.full((len(points), k), np.inf)
+        rows = np.full((len(points), k), -1, dtype=np.int64)
+        if len(self.positions):
+            for start in range(0, len(points), QUERY_BATCH_SIZE):
+                batch = slice(start, start + QUERY_BATCH_SIZE)
+                self.nearest_batch(points[batch], min(k, len(self.positions)), distances[batch], rows[batch])
+        return (distances[0], rows[0]) if single else (distances, rows)
+
+    def nearest_batch(self, points, k, distances, rows):
+        centres = self.cell_coordinates(points)
+        outside = np.linalg.norm(points - np.clip(points, self.low, self.low + self.dims * self.cell_size), axis=1)
+        active = np.arange(len(points))
+        ring = 0
+        while len(active) and ring <= self.dims.max():
+            offsets = self.ring_offsets(ring)
+            query_indices, candidate_rows = self.cell_rows(np.repeat(active, len(offsets)), (centres[active][:, None, :] + offsets).reshape(-1, 3))
+            candidate_distances = np.linalg.norm(self.positions[candidate_rows] - points[query_indices], axis=1)
+
+            # Merge the candidates with the current best k of every point
+            query_indices = np.concatenate((np.repeat(active, distances.shape[1]), query_indices))
+            candidate_distances = np.concatenate((distances[active].ravel(), candidate_distances))
+            candidate_rows = np.concatenate((rows[active].ravel(), candidate_rows))
+            # Sort by distance, then stable by query, query indices of a batch fit uint16 so numpy uses radix sort
+            order = np.argsort(candidate_distances)
+            order = order[np.argsort(query_indices[order].astype(np.uint16), kind="stable")]
+            query_indices = query_indices[order]
+            ranks = np.arange(len(order)) - np.searchsorted(query_indices, query_indices)
+            best = ranks < distances.shape[1]
+            distances[query_indices[best], ranks[best]] = candidate_distances[order][best]
+            rows[query_indices[best], ranks[best]] = candidate_rows[order][best]
+
+            # Stop once the k-th distance is closer than any node in the later rings can be
+            bound = np.maximum(self.ring_gap(points[active], centres[active], ring), np.hypot(outside[active], ring * self.cell_size))
+            active = active[distances[active, k - 1] > bound]
+            ring += 1
+
+    # Distance from every point to the nearest cell outside the cube of ring cells around its centre cell,
+    # infinite once the cube covers the whole grid
+    def ring_gap(self, points, centres, ring):
+        cell_low = self.low + (centres - ring) * self.cell_size
+        cell_high = self.low + (centres + ring + 1) * self.cell_size
+        low_gap = np.where(centres - ring > 0, points - cell_low, np.inf)
+        high_gap = np.where(centres + ring < self.dims - 1, cell_high - points, np.inf)
+        return np.minimum(low_gap, high_gap).min(axis=1)
+
+    # Rows of the nodes within radius of every point sorted by distance, one array per point
+    def query_radius(self, points, radius):
+        points, single = as_points(points)
+        reach = int(np.ceil(radius / self.cell_size)) if len(self.positions) else 0
+        results = []
+        for start in range(0, len(points), QUERY_BATCH_SIZE):
+            batch = points[start:start + QUERY_BATCH_SIZE]
+            if np.prod(np.minimum(2 * reach + 1, self.dims)) > len(self.positions):
+                # Radius covers most of the grid, comparing every point against all nodes is cheaper
+                for point in batch:
+                    point_distances = np.linalg.norm(self.positions - point, axis=1)
+                    within = np.flatnonzero(point_distances <= radius)
+                    results.append(within[np.argsort(point_distances[within], kind="stable")])
+                continue
+            offsets = np.concatenate([self.ring_offsets(ring) for ring in range(reach + 1)])
+            centres = self.cell_coordinates(batch)
+            query_indices, candidate_rows = self.cell_rows(np.repeat(np.arange(len(batch)), len(offsets)), (centres[:, None, :] + offsets).reshape(-1, 3))
+            candidate_distances = np.linalg.norm(self.positions[candidate_rows] - batch[query_indices], axis=1)
+            within = candidate_distances <= radius
+            query_indices, candidate_rows, candidate_distances = query_indices[within], candidate_rows[within], candidate_distances[within]
+            order = np.lexsort((candidate_distances, query_indices))
+            bounds = np.searchsorted(query_indices[order], np.arange(len(batch) + 1))
+            results.extend(np.split(candidate_rows[order], bounds[1:-1]))
+        return results[0] if single else results
+
+    # Rows of the nodes inside the axis aligned box from low to high, in row order
+    def query_box(self, low, high):
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        if not len(self.positions) or np.any(low > high):
+            return np.empty(0, dtype=np.int64)
+        first_cell = self.cell_coordinates(low[None, :])[0]
+        last_cell = self.cell_coordinates(high[None, :])[0]
+        if np.prod(last_cell - first_cell + 1) > len(self.positions):
+            # Box covers most of the grid, a full scan is cheaper than walking its cells
+            candidate_rows = np.arange(len(self.positions))
+        else:
+            axes = [np.arange(first, last + 1) for first, last in zip(first_cell, last_cell)]
+            cells = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+            _, candidate_rows = self.cell_rows(np.zeros(len(cells), dtype=np.int64), cells)
+        inside = np.all((self.positions[candidate_rows] >= low) & (self.positions[candidate_rows] <= high), axis=1)
+        return np.sort(candidate_rows[inside])
+
+    def query_boxes(self, lows, highs):
+        return [self.query_box(low, high) for low, high in zip(lows, highs)]
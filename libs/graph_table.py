@@ -0,0 +1,80 @@
+import threading
+import numpy as np
+from graph_const import material_mapping
+from libs.graph_data_parser import MATERIAL_NAMES, NODE_DTYPE
+
+TABLE_COLUMNS = list(NODE_DTYPE.names) + ["edges"]
+
+# Node table over the columns of a parsed graph. Only the rows of the page on screen are turned into text,
+# sorting and filtering work on row numbers with sort indexes built once per column on first use.
+class GraphTable:
+    def __init__(self, graph):
+        self.graph = graph
+        self.sort_indexes = {}
+        self.lock = threading.Lock()
+        self.lower_criteria = None
+        self.rows = np.arange(len(graph.nodes))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def node_count(self):
+        return len(self.graph.nodes)
+
+    def column_values(self, column):
+        if column == "material":
+            return MATERIAL_NAMES[self.graph.nodes["material"]]
+        if column == "edges":
+            return self.graph.adjacency.degrees()  # Sorted by the number of links
+        return self.graph.nodes[column]
+
+    # Rows in ascending order of the column, ties keep their row order
+    def sort_index(self, column):
+        with self.lock:
+            if column not in self.sort_indexes:
+                self.sort_indexes[column] = np.argsort(self.column_values(column), kind="stable")
+            return self.sort_indexes[column]
+
+    # Rows with an id from id_low to id_high, found in the id sort index without scanning the ids
+    def id_range_rows(self, id_low=None, id_high=None):
+        order = self.sort_index("id")
+        sorted_ids = self.graph.nodes["id"][order]
+        first = np.searchsorted(sorted_ids, id_low, side="left") if id_low is not None else 0
+        last = np.searchsorted(sorted_ids, id_high, side="right") if id_high is not None else len(order)
+        return order[first:last]
+
+    def filter_mask(self, materials=None, criteria=None, id_low=None, id_high=None):
+        nodes = self.graph.nodes
+        mask = np.ones(len(nodes), dtype=bool)
+        if id_low is not None or id_high is not None:
+            mask[:] = False
+            mask[self.id_range_rows(id_low, id_high)] = True
+        if materials:
+            codes = [code for code, name in material_mapping.items() if name in materials or code in materials]
+            mask &= np.isin(nodes["material"], codes)
+        if criteria:
+            if self.lower_criteria is None:
+                self.lower_criteria = np.char.lower(nodes["criteria"])
+            mask &= np.char.find(self.lower_criteria, criteria.lower()) >= 0
+        return mask
+
+    # Choose the rows shown and their order, materials match names or codes and criteria matches part of the text
+    def update(self, sort_column=None, descending=False, materials=None, criteria=None, id_low=None, id_high=None):
+        order = self.sort_index(sort_column) if sort_column else np.arange(self.node_count)
+        if descending:
+            order = order[::-1]
+        if materials or criteria or id_low is not None or id_high is not None:
+            order = order[self.filter_mask(materials, criteria, id_low, id_high)[order]]
+        self.rows = order
+        return len(order)
+
+    # Values of the shown rows from start, as tuples in the order of TABLE_COLUMNS
+    def page(self, start, count):
+        rows = self.rows[start:start + count]
+        nodes = self.graph.nodes[rows]
+        adjacency = self.graph.adjacency
+        links = [", ".join(map(str, adjacency.neighbours_of(row).tolist())) for row in rows.tolist()]
+        columns = [nodes[name].tolist() for name in NODE_DTYPE.names]
+        columns[NODE_DTYPE.names.index("material")] = MATERIAL_NAMES[nodes["material"]].tolist()
+        return list(zip(*columns, links))